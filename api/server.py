@@ -1,10 +1,11 @@
 from fastapi import FastAPI, HTTPException, Query
 from fastapi.middleware.cors import CORSMiddleware
-from storage.supabase_client import supabase
-import os, logging
-from typing import Optional
+from storage.backend import get_storage, select_columns
+import asyncio, os, logging
+from typing import Dict, List, Optional, Tuple
 
 LOG = logging.getLogger(__name__)
+storage = get_storage()
 app = FastAPI(
     title='Flutter Knowledge API',
     description='API for accessing Flutter documentation, packages, and GitHub issues',
@@ -20,62 +21,120 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+FIELDS_HELP = "Comma-separated columns to return, or * for all (default: a compact summary)"
+
+def columns_for(table: str, fields: Optional[str], ignore_unknown: bool = False) -> Tuple[str, ...]:
+    try:
+        return select_columns(table, fields, ignore_unknown)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+def get_row(table: str, row_id: str, fields: Optional[str]):
+    if not storage.configured:
+        raise HTTPException(status_code=503, detail='Storage not configured')
+    columns = columns_for(table, fields or '*')
+    try:
+        row = storage.get(table, row_id, columns=columns)
+    except Exception as e:
+        LOG.exception("Error fetching %s %s: %s", table, row_id, e)
+        raise HTTPException(status_code=500, detail='Internal server error')
+    if row is None:
+        raise HTTPException(status_code=404, detail='Not found')
+    return {'data': row}
+
 @app.get('/health')
 def health():
     """Health check endpoint"""
     return {
         'status': 'ok',
-        'supabase_configured': supabase is not None,
+        'storage_backend': storage.name,
+        'supabase_configured': storage.name == 'supabase' and storage.configured,
         'version': '1.0.0'
     }
 
 @app.get('/api/flutter/docs')
 def get_docs(
     limit: int = Query(50, ge=1, le=100, description="Number of docs to return"),
-    search: Optional[str] = Query(None, description="Search in title and content")
+    search: Optional[str] = Query(None, description="Search in title and content"),
+    fields: Optional[str] = Query(None, description=FIELDS_HELP)
 ):
     """Get Flutter documentation entries"""
-    if supabase is None:
-        raise HTTPException(status_code=503, detail='Supabase not configured')
+    if not storage.configured:
+        raise HTTPException(status_code=503, detail='Storage not configured')
+    columns = columns_for('flutter_docs', fields)
     
     try:
-        query = supabase.table('flutter_docs').select('*')
-        
-        if search:
-            query = query.or_(f'title.ilike.%{search}%,content.ilike.%{search}%')
-        
-        res = query.order('updated_at', desc=True).limit(limit).execute()
+        data = storage.list('flutter_docs', columns=columns, search=search, order='updated_at', limit=limit)
         return {
-            'data': res.data,
-            'count': len(res.data),
+            'data': data,
+            'count': len(data),
             'search': search
         }
     except Exception as e:
         LOG.exception("Error fetching docs: %s", e)
         raise HTTPException(status_code=500, detail='Internal server error')
 
+@app.get('/api/flutter/docs/chunks')
+def get_doc_chunks(
+    search: Optional[str] = Query(None, description="Search in section headings and content"),
+    doc_id: Optional[str] = Query(None, description="Only sections of this doc, in page order"),
+    limit: int = Query(20, ge=1, le=100, description="Number of chunks to return"),
+    fields: Optional[str] = Query(None, description=FIELDS_HELP)
+):
+    """Get section-level chunks of Flutter documentation pages"""
+    if not storage.configured:
+        raise HTTPException(status_code=503, detail='Storage not configured')
+    columns = columns_for('flutter_doc_chunks', fields)
+    
+    try:
+        data = storage.list(
+            'flutter_doc_chunks',
+            columns=columns,
+            eq={'doc_id': doc_id} if doc_id else None,
+            search=search,
+            order='position' if doc_id else None,
+            desc=False,
+            limit=limit
+        )
+        return {
+            'data': data,
+            'count': len(data),
+            'search': search,
+            'doc_id': doc_id
+        }
+    except Exception as e:
+        LOG.exception("Error fetching doc chunks: %s", e)
+        raise HTTPException(status_code=500, detail='Internal server error')
+
 @app.get('/api/flutter/issues')
 def get_issues(
     limit: int = Query(50, ge=1, le=100, description="Number of issues to return"),
-    labels: Optional[str] = Query(None, description="Filter by labels (comma-separated)")
+    labels: Optional[str] = Query(None, description="Filter by labels (comma-separated)"),
+    state: Optional[str] = Query(None, pattern='^(open|closed)$', description="Filter by issue state"),
+    repo: Optional[str] = Query(None, max_length=100, description="Filter by repository, e.g. dart-lang/sdk"),
+    fields: Optional[str] = Query(None, description=FIELDS_HELP)
 ):
-    """Get GitHub issues from flutter/flutter repository"""
-    if supabase is None:
-        raise HTTPException(status_code=503, detail='Supabase not configured')
+    """Get GitHub issues from the configured Flutter repositories"""
+    if not storage.configured:
+        raise HTTPException(status_code=503, detail='Storage not configured')
+    columns = columns_for('github_issues', fields)
     
     try:
-        query = supabase.table('github_issues').select('*')
-        
-        if labels:
-            label_list = [label.strip() for label in labels.split(',')]
-            for label in label_list:
-                query = query.contains('labels', [label])
+        eq = {}
+        if state:
+            eq['state'] = state
+        if repo:
+            eq['repo'] = repo
+        contains = {'labels': [label.strip() for label in labels.split(',')]} if labels else None
         
-        res = query.order('created_at', desc=True).limit(limit).execute()
+        data = storage.list('github_issues', columns=columns, eq=eq, contains=contains, order='created_at',
+                            limit=limit)
         return {
-            'data': res.data,
-            'count': len(res.data),
-            'labels_filter': labels
+            'data': data,
+            'count': len(data),
+            'labels_filter': labels,
+            'state_filter': state,
+            'repo_filter': repo
         }
     except Exception as e:
         LOG.exception("Error fetching issues: %s", e)
@@ -84,63 +143,88 @@ def get_issues(
 @app.get('/api/flutter/packages')
 def get_packages(
     limit: int = Query(50, ge=1, le=100, description="Number of packages to return"),
-    search: Optional[str] = Query(None, description="Search in package name and description")
+    search: Optional[str] = Query(None, description="Search in package name and description"),
+    sort: str = Query('updated', pattern='^(updated|popularity|likes|points)$', description="Sort order"),
+    fields: Optional[str] = Query(None, description=FIELDS_HELP)
 ):
     """Get Flutter packages from pub.dev"""
-    if supabase is None:
-        raise HTTPException(status_code=503, detail='Supabase not configured')
+    if not storage.configured:
+        raise HTTPException(status_code=503, detail='Storage not configured')
+    columns = columns_for('pub_packages', fields)
     
     try:
-        query = supabase.table('pub_packages').select('*')
+        sort_column = 'updated_at' if sort == 'updated' else sort
+        not_null = (sort_column,) if sort != 'updated' else ()
         
-        if search:
-            query = query.or_(f'name.ilike.%{search}%,description.ilike.%{search}%')
-        
-        res = query.order('updated_at', desc=True).limit(limit).execute()
+        data = storage.list('pub_packages', columns=columns, search=search, not_null=not_null,
+                            order=sort_column, limit=limit)
         return {
-            'data': res.data,
-            'count': len(res.data),
-            'search': search
+            'data': data,
+            'count': len(data),
+            'search': search,
+            'sort': sort
         }
     except Exception as e:
         LOG.exception("Error fetching packages: %s", e)
         raise HTTPException(status_code=500, detail='Internal server error')
 
+@app.get('/api/flutter/docs/{doc_id}')
+def get_doc(doc_id: str, fields: Optional[str] = Query(None, description=FIELDS_HELP)):
+    """Get one documentation page with its full content"""
+    return get_row('flutter_docs', doc_id, fields)
+
+@app.get('/api/flutter/packages/{package_id}')
+def get_package(package_id: str, fields: Optional[str] = Query(None, description=FIELDS_HELP)):
+    """Get one package with its full pub.dev metadata"""
+    return get_row('pub_packages', package_id, fields)
+
+@app.get('/api/flutter/issues/{issue_id}')
+def get_issue(issue_id: str, fields: Optional[str] = Query(None, description=FIELDS_HELP)):
+    """Get one GitHub issue with its full body"""
+    return get_row('github_issues', issue_id, fields)
+
+SEARCH_SOURCE_TIMEOUT = float(os.getenv('SEARCH_SOURCE_TIMEOUT', '3'))
+
+async def search_source(table: str, q: str, limit: int, fuzzy: bool, fields: Optional[str]) -> Optional[List[Dict]]:
+    """Results from one table, or None if it timed out or failed."""
+    lookup = storage.afuzzy if fuzzy else storage.asearch
+    columns = columns_for(table, fields, ignore_unknown=True)
+    try:
+        return await asyncio.wait_for(lookup(table, q, limit=limit, columns=columns), SEARCH_SOURCE_TIMEOUT)
+    except asyncio.TimeoutError:
+        LOG.warning("Search of %s timed out after %.1fs", table, SEARCH_SOURCE_TIMEOUT)
+    except Exception as e:
+        LOG.exception("Error searching %s: %s", table, e)
+    return None
+
 @app.get('/api/flutter/search')
-def search_all(
+async def search_all(
     q: str = Query(..., description="Search query"),
-    limit: int = Query(20, ge=1, le=50, description="Results per category")
+    limit: int = Query(20, ge=1, le=50, description="Results per category"),
+    fuzzy: bool = Query(False, description="Match names and titles by similarity, tolerating typos"),
+    fields: Optional[str] = Query(None, description=FIELDS_HELP + "; columns a category lacks are skipped")
 ):
     """Search across all Flutter resources"""
-    if supabase is None:
-        raise HTTPException(status_code=503, detail='Supabase not configured')
+    if not storage.configured:
+        raise HTTPException(status_code=503, detail='Storage not configured')
     
-    try:
-        results = {}
-        
-        # Search docs
-        docs_res = supabase.table('flutter_docs').select('*').or_(
-            f'title.ilike.%{q}%,content.ilike.%{q}%'
-        ).limit(limit).execute()
-        results['docs'] = docs_res.data
-        
-        # Search packages
-        packages_res = supabase.table('pub_packages').select('*').or_(
-            f'name.ilike.%{q}%,description.ilike.%{q}%'
-        ).limit(limit).execute()
-        results['packages'] = packages_res.data
-        
-        # Search issues
-        issues_res = supabase.table('github_issues').select('*').or_(
-            f'title.ilike.%{q}%,body.ilike.%{q}%'
-        ).limit(limit).execute()
-        results['issues'] = issues_res.data
-        
-        return {
-            'query': q,
-            'results': results,
-            'total_results': len(results['docs']) + len(results['packages']) + len(results['issues'])
-        }
-    except Exception as e:
-        LOG.exception("Error searching: %s", e)
-        raise HTTPException(status_code=500, detail='Internal server error')
+    search_query = q.strip()[:100]  # Limit search length
+    if not search_query:
+        raise HTTPException(status_code=400, detail='Search query cannot be empty')
+    
+    sources = {'docs': 'flutter_docs', 'packages': 'pub_packages', 'issues': 'github_issues'}
+    found = await asyncio.gather(*(search_source(table, search_query, limit, fuzzy, fields)
+                                   for table in sources.values()))
+    missing = [key for key, rows in zip(sources, found) if rows is None]
+    if len(missing) == len(sources):
+        raise HTTPException(status_code=503, detail='Search is unavailable')
+    results = {key: rows or [] for key, rows in zip(sources, found)}
+    
+    return {
+        'query': search_query,
+        'fuzzy': fuzzy,
+        'results': results,
+        'partial': bool(missing),
+        'missing_sources': missing,
+        'total_results': len(results['docs']) + len(results['packages']) + len(results['issues'])
+    }
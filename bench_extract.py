@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark: BeautifulSoup(html.parser) vs the lxml extraction path.
+
+Runs both extractors over saved HTML pages and reports the per-page cost.
+
+    python bench_extract.py --save 50        # save 50 docs pages to bench_pages/
+    python bench_extract.py                  # benchmark every page in bench_pages/
+    python bench_extract.py path/to/pages -n 20
+"""
+import argparse
+import glob
+import os
+import statistics
+import sys
+import time
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from bs4 import BeautifulSoup
+from fetch.extract import extract_page
+
+DEFAULT_DIR = 'bench_pages'
+
+
+def extract_bs4(html: str) -> str:
+    """The extraction path used before fetch.extract (kept as the baseline)."""
+    soup = BeautifulSoup(html, 'html.parser')
+    main_content = soup.find('main') or soup.find('article') or soup.find('div', class_='content')
+    if main_content:
+        return main_content.get_text(strip=True)
+    return soup.get_text(strip=True)
+
+
+def extract_lxml(html: str) -> str:
+    return extract_page(html).text
+
+
+def save_pages(directory: str, count: int) -> None:
+    from fetch.docs_crawler import SITEMAP_URL, parse_sitemap
+    from fetch.engine import fetch_all
+
+    sitemap = fetch_all([SITEMAP_URL])[0]
+    if not sitemap.ok:
+        sys.exit(f'Could not fetch {SITEMAP_URL}: {sitemap.error or sitemap.status}')
+    urls = [url for url, _ in parse_sitemap(sitemap.text)[0]][:count]
+    os.makedirs(directory, exist_ok=True)
+    saved = 0
+    for res in fetch_all(urls):
+        if res.ok:
+            name = res.url.rstrip('/').rsplit('/', 1)[-1] or 'index'
+            with open(os.path.join(directory, f'{saved:04d}-{name}.html'), 'w', encoding='utf-8') as f:
+                f.write(res.text)
+            saved += 1
+    print(f'Saved {saved} pages to {directory}/')
+
+
+def time_per_page(fn, pages, repeat: int):
+    samples = []
+    for html in pages:
+        start = time.perf_counter()
+        for _ in range(repeat):
+            fn(html)
+        samples.append((time.perf_counter() - start) / repeat)
+    return samples
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('directory', nargs='?', default=DEFAULT_DIR, help='directory of saved .html pages')
+    parser.add_argument('-n', '--repeat', type=int, default=5, help='runs per page (default: 5)')
+    parser.add_argument('--save', type=int, metavar='N', help='download N docs pages into the directory first')
+    args = parser.parse_args()
+
+    if args.save:
+        save_pages(args.directory, args.save)
+
+    paths = sorted(glob.glob(os.path.join(args.directory, '*.html')))
+    if not paths:
+        sys.exit(f'No .html files in {args.directory}/ (use --save N to download some)')
+    pages = []
+    for path in paths:
+        with open(path, encoding='utf-8', errors='replace') as f:
+            pages.append(f.read())
+    total_kb = sum(len(p) for p in pages) / 1024
+    print(f'{len(pages)} pages, {total_kb:.0f} KB, {args.repeat} runs each\n')
+
+    results = {}
+    for name, fn in (('bs4 html.parser', extract_bs4), ('lxml targeted', extract_lxml)):
+        samples = time_per_page(fn, pages, args.repeat)
+        results[name] = samples
+        print(f'{name:<16} mean {statistics.mean(samples) * 1000:8.2f} ms/page   '
+              f'median {statistics.median(samples) * 1000:8.2f} ms/page')
+
+    base, fast = results['bs4 html.parser'], results['lxml targeted']
+    speedups = [b / f for b, f in zip(base, fast) if f > 0]
+    print(f'\nspeedup: {statistics.mean(base) / statistics.mean(fast):.1f}x overall, '
+          f'{statistics.median(speedups):.1f}x median per page')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,38 @@
+"""Split docs pages into section-level chunks for the ``flutter_doc_chunks`` table.
+
+Each chunk is one h2/h3 section of a page (plus the lead text before the
+first heading), addressable by an anchor URL, so search and IDE clients can
+return the relevant few hundred tokens instead of a whole page.
+"""
+import re
+from typing import Dict, List
+
+from fetch.extract import Section
+
+_TOKEN_RE = re.compile(r'\w+|[^\w\s]')
+
+
+def count_tokens(text: str) -> int:
+    """Approximate LLM token count: words and punctuation marks."""
+    return len(_TOKEN_RE.findall(text))
+
+
+def chunk_id(doc_id: str, position: int) -> str:
+    return f'{doc_id}:{position}'
+
+
+def build_chunks(doc_id: str, url: str, title: str, sections: List[Section]) -> List[Dict]:
+    """Rows for ``flutter_doc_chunks``, one per section, in page order."""
+    chunks = []
+    for position, section in enumerate(sections):
+        chunks.append({
+            'id': chunk_id(doc_id, position),
+            'doc_id': doc_id,
+            'position': position,
+            'heading': section.heading or title,
+            'anchor': section.anchor,
+            'url': f'{url}#{section.anchor}' if section.anchor else url,
+            'content': section.text,
+            'token_count': count_tokens(section.text),
+        })
+    return chunks
@@ -0,0 +1,340 @@
+"""Sitemap-driven crawler for docs.flutter.dev.
+
+The crawl is seeded from ``sitemap.xml`` and follows in-site links. Every
+known URL is kept in a deduplicated, priority-ordered frontier stored on disk,
+so an interrupted crawl resumes with the URLs it had not finished instead of
+starting over.
+"""
+import asyncio
+import logging
+import os
+import threading
+import time
+import xml.etree.ElementTree as ET
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Iterable, Iterator, List, Mapping, Optional, Tuple
+from urllib.parse import urljoin, urlsplit, urlunsplit
+
+from fetch.engine import AsyncFetcher, FETCH_CONCURRENCY, FetchResult
+from fetch.http_cache import ValidatorCache, get_validator_cache
+from utils.state import connect
+
+LOG = logging.getLogger(__name__)
+
+DOCS_HOST = 'docs.flutter.dev'
+DOCS_ROOT = f'https://{DOCS_HOST}/'
+SITEMAP_URL = f'https://{DOCS_HOST}/sitemap.xml'
+
+CRAWL_BATCH_SIZE = int(os.getenv('CRAWL_BATCH_SIZE', str(FETCH_CONCURRENCY * 4)))
+# Priority handed to a discovered link, relative to the page it was found on.
+LINK_PRIORITY_DECAY = 0.5
+DEFAULT_SITEMAP_PRIORITY = 0.5
+
+_SKIP_EXTENSIONS = (
+    '.png', '.jpg', '.jpeg', '.gif', '.svg', '.webp', '.ico', '.pdf', '.zip',
+    '.gz', '.mp4', '.webm', '.css', '.js', '.json', '.xml', '.txt',
+)
+_SITEMAP_NS = '{http://www.sitemaps.org/schemas/sitemap/0.9}'
+
+# parse(url, html, requested url) -> (row or None, links found on the page);
+# the requested url differs from ``url`` after a redirect.
+PageParser = Callable[[str, str, str], Tuple[Optional[Dict], Iterable[str]]]
+
+
+def canonicalize(url: str, base: str = DOCS_ROOT) -> Optional[str]:
+    """Resolve ``url`` against ``base`` and return it if it is a crawlable docs page."""
+    parts = urlsplit(urljoin(base, url.strip()))
+    if parts.scheme not in ('http', 'https') or parts.hostname != DOCS_HOST:
+        return None
+    path = parts.path or '/'
+    if path.lower().endswith(_SKIP_EXTENSIONS):
+        return None
+    if len(path) > 1:
+        path = path.rstrip('/')
+    return urlunsplit(('https', DOCS_HOST, path, '', ''))
+
+
+@dataclass
+class CrawlStats:
+    """Throughput counters for one crawl run."""
+    pages: int = 0
+    unchanged: int = 0
+    bytes: int = 0
+    errors: int = 0
+    started: float = field(default_factory=time.monotonic)
+    finished: Optional[float] = None
+
+    @property
+    def elapsed(self) -> float:
+        return max((self.finished or time.monotonic()) - self.started, 1e-9)
+
+    @property
+    def pages_per_sec(self) -> float:
+        return self.pages / self.elapsed
+
+    @property
+    def bytes_per_sec(self) -> float:
+        return self.bytes / self.elapsed
+
+    def record(self, res: FetchResult) -> None:
+        if res.ok:
+            self.pages += 1
+            self.bytes += res.size
+        elif res.not_modified:
+            self.unchanged += 1
+        else:
+            self.errors += 1
+
+    def as_dict(self) -> Dict:
+        return {
+            'pages': self.pages,
+            'unchanged': self.unchanged,
+            'bytes': self.bytes,
+            'errors': self.errors,
+            'elapsed_sec': round(self.elapsed, 3),
+            'pages_per_sec': round(self.pages_per_sec, 2),
+            'bytes_per_sec': round(self.bytes_per_sec, 1),
+        }
+
+
+class Frontier:
+    """Deduplicated, priority-ordered URL queue persisted in SQLite.
+
+    A URL is ``pending``, ``yielded`` (fetched and handed on, not yet stored),
+    ``done`` or ``failed``. Safe to use from several threads.
+    """
+
+    def __init__(self, name: str = 'docs_frontier.db'):
+        self._lock = threading.Lock()
+        self.conn = connect(name)
+        self.conn.execute(
+            'create table if not exists frontier ('
+            ' url text primary key,'
+            ' priority real not null,'
+            " state text not null default 'pending',"
+            ' added_at real not null)'
+        )
+        self.conn.execute('create index if not exists frontier_pending on frontier (state, priority desc)')
+        self.conn.commit()
+
+    def add(self, urls: Iterable[str], priority: float) -> None:
+        """Queue new URLs; a URL already pending keeps the higher of its priorities."""
+        now = time.time()
+        with self._lock, self.conn:
+            self.conn.executemany(
+                "insert into frontier (url, priority, state, added_at) values (?, ?, 'pending', ?) "
+                'on conflict(url) do update set priority = max(priority, excluded.priority) '
+                "where state = 'pending'",
+                [(u, priority, now) for u in urls],
+            )
+
+    def next_batch(self, n: int) -> List[Tuple[str, float]]:
+        with self._lock:
+            cur = self.conn.execute(
+                "select url, priority from frontier where state = 'pending' "
+                'order by priority desc, added_at, url limit ?',
+                (n,),
+            )
+            return cur.fetchall()
+
+    def mark(self, urls: Iterable[str], state: str) -> None:
+        now = time.time()
+        with self._lock, self.conn:
+            self.conn.executemany(
+                'insert into frontier (url, priority, state, added_at) values (?, 0, ?, ?) '
+                'on conflict(url) do update set state = excluded.state',
+                [(u, state, now) for u in urls],
+            )
+
+    def is_done(self, url: str) -> bool:
+        with self._lock:
+            row = self.conn.execute("select 1 from frontier where url = ? and state != 'pending'",
+                                    (url,)).fetchone()
+        return row is not None
+
+    def count(self, state: str) -> int:
+        with self._lock:
+            return self.conn.execute('select count(*) from frontier where state = ?', (state,)).fetchone()[0]
+
+    def requeue_unconfirmed(self) -> None:
+        """Queue again the pages a previous run yielded but never saw stored."""
+        with self._lock, self.conn:
+            self.conn.execute("update frontier set state = 'pending' where state = 'yielded'")
+
+    def requeue(self) -> None:
+        """Start a new crawl: queue every known page again and drop failed ones.
+
+        Known URLs are kept so pages only reachable through links are still
+        visited when their linking pages come back unchanged (304).
+        """
+        with self._lock, self.conn:
+            self.conn.execute("delete from frontier where state = 'failed'")
+            self.conn.execute("update frontier set state = 'pending'")
+
+
+def parse_sitemap(xml_text: str) -> Tuple[List[Tuple[str, float]], List[str]]:
+    """Return ``(pages, child_sitemaps)`` from a sitemap or sitemap index document."""
+    root = ET.fromstring(xml_text.encode('utf-8'))
+    pages, children = [], []
+    for node in root.iter(f'{_SITEMAP_NS}sitemap'):
+        loc = node.findtext(f'{_SITEMAP_NS}loc')
+        if loc:
+            children.append(loc.strip())
+    for node in root.iter(f'{_SITEMAP_NS}url'):
+        loc = node.findtext(f'{_SITEMAP_NS}loc')
+        if not loc:
+            continue
+        try:
+            priority = float(node.findtext(f'{_SITEMAP_NS}priority') or DEFAULT_SITEMAP_PRIORITY)
+        except ValueError:
+            priority = DEFAULT_SITEMAP_PRIORITY
+        pages.append((loc.strip(), priority))
+    return pages, children
+
+
+class DocsCrawler:
+    """Crawl docs.flutter.dev, yielding parsed rows in batches.
+
+    A yielded page is only marked done in the frontier, and its HTTP
+    validators stored, when the consumer passes its row to ``confirm`` after
+    storing it, which may happen on another thread. Pages never confirmed are
+    fetched again in full by the next run, so a failed write is retried
+    rather than answered with 304. Pages answering 304 Not Modified are
+    neither parsed nor yielded.
+    """
+
+    def __init__(self, parse: PageParser, seeds: Iterable[str] = (), max_pages: int = 0,
+                 batch_size: int = CRAWL_BATCH_SIZE, concurrency: int = FETCH_CONCURRENCY,
+                 frontier: Optional[Frontier] = None, validators: Optional[ValidatorCache] = None):
+        self.parse = parse
+        self.seeds = list(seeds)
+        self.max_pages = max_pages
+        self.batch_size = max(1, batch_size)
+        self.concurrency = concurrency
+        self.frontier = frontier or Frontier()
+        self.validators = validators if validators is not None else get_validator_cache()
+        self.stats = CrawlStats()
+        # Row url -> (requested url, response headers) of yielded, unconfirmed pages.
+        self._unconfirmed: Dict[str, Tuple[str, Mapping[str, str]]] = {}
+        self._unconfirmed_lock = threading.Lock()
+
+    def confirm(self, rows: Iterable[Dict]) -> None:
+        """Record yielded ``rows`` (matched by their ``url``) as stored."""
+        with self._unconfirmed_lock:
+            pages = [(row.get('url'), self._unconfirmed.pop(row.get('url'), None)) for row in rows]
+        pages = [(row_url, page) for row_url, page in pages if page]
+        if self.validators is not None:
+            self.validators.store_many(page for _, page in pages)
+        # The row url differs from the requested one after a redirect.
+        self.frontier.mark({url for row_url, (requested, _) in pages for url in (row_url, requested)}, 'done')
+
+    def crawl(self) -> Iterator[List[Dict]]:
+        self.stats = CrawlStats()
+        loop = asyncio.new_event_loop()
+        fetcher = AsyncFetcher(concurrency=self.concurrency, validators=self.validators)
+        loop.run_until_complete(fetcher.__aenter__())
+        try:
+            self.frontier.requeue_unconfirmed()
+            pending = self.frontier.count('pending')
+            if pending:
+                LOG.info('Resuming docs crawl: %d pending, %d done', pending, self.frontier.count('done'))
+            else:
+                self.frontier.requeue()
+                loop.run_until_complete(self._seed(fetcher))
+            while True:
+                n = self.batch_size
+                if self.max_pages:
+                    n = min(n, self.max_pages - self.stats.pages - self.stats.unchanged - self.stats.errors)
+                batch = self.frontier.next_batch(n) if n > 0 else []
+                if not batch:
+                    break
+                results = loop.run_until_complete(fetcher.fetch_many(url for url, _ in batch))
+                rows, done, failed, yielded = [], [], [], []
+                for (url, priority), res in zip(batch, results):
+                    self.stats.record(res)
+                    if res.not_modified:
+                        done.append(url)
+                        continue
+                    row, handled = self._handle(url, priority, res)
+                    if row:
+                        rows.append(row)
+                        yielded.append(url)
+                        with self._unconfirmed_lock:
+                            self._unconfirmed[row.get('url', url)] = (url, res.headers)
+                    else:
+                        (done if handled else failed).append(url)
+                self.frontier.mark(done, 'done')
+                self.frontier.mark(failed, 'failed')
+                self.frontier.mark(yielded, 'yielded')
+                if rows:
+                    yield rows
+        finally:
+            loop.run_until_complete(fetcher.__aexit__(None, None, None))
+            loop.close()
+            self.stats.finished = time.monotonic()
+            LOG.info(
+                'Docs crawl: %d pages, %d unchanged, %d errors, %.1f pages/s, %.1f KB/s (%d still pending)',
+                self.stats.pages, self.stats.unchanged, self.stats.errors, self.stats.pages_per_sec,
+                self.stats.bytes_per_sec / 1024, self.frontier.count('pending'),
+            )
+
+    async def _seed(self, fetcher: AsyncFetcher) -> None:
+        seeds = [(u, 1.0) for u in [DOCS_ROOT] + self.seeds]
+        sitemaps = [SITEMAP_URL]
+        seen_sitemaps = set()
+        while sitemaps:
+            url = sitemaps.pop()
+            if url in seen_sitemaps:
+                continue
+            seen_sitemaps.add(url)
+            # Always fetched in full: the sitemap is what seeds the crawl.
+            res = await fetcher.fetch(url, conditional=False)
+            if not res.ok:
+                LOG.warning('Failed to fetch sitemap %s: %s', url, res.error or f'HTTP {res.status}')
+                continue
+            try:
+                pages, children = parse_sitemap(res.text)
+            except ET.ParseError as e:
+                LOG.warning('Invalid sitemap %s: %s', url, e)
+                continue
+            seeds.extend(pages)
+            sitemaps.extend(children)
+        by_priority: Dict[float, List[str]] = {}
+        for url, priority in seeds:
+            canonical = canonicalize(url)
+            if canonical:
+                by_priority.setdefault(priority, []).append(canonical)
+        for priority, urls in by_priority.items():
+            self.frontier.add(urls, priority)
+        LOG.info('Seeded docs frontier with %d URLs', self.frontier.count('pending'))
+
+    def _handle(self, url: str, priority: float, res: FetchResult) -> Tuple[Optional[Dict], bool]:
+        """Parse a fetched page: ``(row or None, whether the page is done without a row)``."""
+        if not res.ok:
+            LOG.warning('Failed to fetch %s: %s', url, res.error or f'HTTP {res.status}')
+            return None, False
+        if 'html' not in res.headers.get('content-type', 'text/html'):
+            return None, True
+        requested = url
+        final = canonicalize(res.final_url or url)
+        redirected = bool(final) and final != url
+        if redirected:
+            # Redirected: store the page under its final URL, once.
+            if self.frontier.is_done(final):
+                return None, True
+            url = final
+        try:
+            row, links = self.parse(url, res.text, requested)
+        except Exception as e:
+            LOG.warning('Failed to parse %s: %s', url, e)
+            row, links, parsed = None, (), False
+        else:
+            # A redirect that yields nothing is retried rather than remembered as done.
+            parsed = row is not None or not redirected
+        if redirected:
+            # Like the requested URL, the final one waits for confirm() or is retried.
+            self.frontier.mark([url], 'yielded' if row else 'failed')
+        found = {c for c in (canonicalize(link, url) for link in links) if c}
+        if found:
+            self.frontier.add(found, priority * LINK_PRIORITY_DECAY)
+        return row, parsed
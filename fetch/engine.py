@@ -0,0 +1,116 @@
+"""Asynchronous page fetch engine used by the fetchers.
+
+Pages are downloaded concurrently over the process-wide keep-alive connection
+pool (``utils.transport``), so the wall time of a fetch tracks the slowest
+requests instead of the sum of all of them, and a new fetcher reuses the
+connections an earlier one opened.
+"""
+import asyncio
+import logging
+import os
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional
+
+import httpx
+
+from fetch.http_cache import ValidatorCache
+from fetch.politeness import RequestScheduler, get_scheduler
+from utils.transport import SharedTransport, get_transport
+
+LOG = logging.getLogger(__name__)
+
+FETCH_CONCURRENCY = int(os.getenv('FETCH_CONCURRENCY', '16'))
+FETCH_TIMEOUT = float(os.getenv('FETCH_TIMEOUT', '15'))
+
+
+@dataclass
+class FetchResult:
+    """Outcome of a single GET; ``status`` is 0 when no response arrived."""
+    url: str
+    status: int = 0
+    text: str = ''
+    headers: Dict[str, str] = field(default_factory=dict)
+    final_url: str = ''
+    error: Optional[str] = None
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None and 200 <= self.status < 300
+
+    @property
+    def not_modified(self) -> bool:
+        return self.status == 304
+
+    @property
+    def size(self) -> int:
+        return len(self.text.encode('utf-8'))
+
+
+class AsyncFetcher:
+    """Bounded-concurrency GET client; use as ``async with AsyncFetcher() as f``.
+
+    With a ``validators`` cache, requests are conditional and unchanged pages
+    come back as ``not_modified`` results without a body. Every request goes
+    through the per-host politeness ``scheduler`` (rate limit and retries).
+    """
+
+    def __init__(self, concurrency: int = FETCH_CONCURRENCY, timeout: float = FETCH_TIMEOUT,
+                 validators: Optional[ValidatorCache] = None,
+                 scheduler: Optional[RequestScheduler] = None,
+                 transport: Optional[SharedTransport] = None):
+        self.concurrency = max(1, concurrency)
+        # Requests queue on the semaphore, never on the pool.
+        self.timeout = httpx.Timeout(timeout, pool=None)
+        self.validators = validators
+        self.scheduler = scheduler or get_scheduler()
+        self.transport = transport or get_transport()
+        self._slots: Optional[asyncio.Semaphore] = None
+
+    async def __aenter__(self) -> 'AsyncFetcher':
+        self._slots = asyncio.Semaphore(self.concurrency)
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        # The connections stay open in the shared pool for the next fetcher.
+        self._slots = None
+
+    async def fetch(self, url: str, headers: Optional[Dict[str, str]] = None,
+                    conditional: bool = True) -> FetchResult:
+        if conditional and self.validators is not None:
+            headers = {**self.validators.headers_for(url), **(headers or {})}
+
+        async def send() -> httpx.Response:
+            # Only hold a connection slot while the request is in flight,
+            # not while backing off.
+            async with self._slots:
+                return await self.transport.arequest('GET', url, headers=headers, timeout=self.timeout,
+                                                     follow_redirects=True)
+
+        try:
+            r = await self.scheduler.arun(url, send)
+        except httpx.HTTPError as e:
+            return FetchResult(url=url, error=f'{type(e).__name__}: {e}')
+        return FetchResult(
+            url=url,
+            status=r.status_code,
+            text=r.text,
+            headers=dict(r.headers),
+            final_url=str(r.url),
+        )
+
+    async def fetch_many(self, urls: Iterable[str]) -> List[FetchResult]:
+        """Fetch ``urls`` concurrently, returning results in input order."""
+        return list(await asyncio.gather(*(self.fetch(u) for u in urls)))
+
+
+def fetch_all(urls: Iterable[str], concurrency: int = FETCH_CONCURRENCY,
+              timeout: float = FETCH_TIMEOUT) -> List[FetchResult]:
+    """Synchronous entry point: fetch every URL and return results in order."""
+    urls = list(urls)
+
+    async def _run() -> List[FetchResult]:
+        async with AsyncFetcher(concurrency=concurrency, timeout=timeout) as fetcher:
+            return await fetcher.fetch_many(urls)
+
+    LOG.debug('Fetching %d URLs with concurrency %d', len(urls), concurrency)
+    return asyncio.run(_run())
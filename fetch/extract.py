@@ -0,0 +1,167 @@
+"""Fast HTML text extraction built on lxml.
+
+Only the ``<main>`` (or ``<article>``) part of a page is handed to the
+parser; the title and outgoing links are pulled out of the raw markup with
+regular expressions, so the rest of the document never becomes a tree.
+Block-level elements are separated by newlines, which keeps words from being
+glued together the way ``get_text(strip=True)`` does. The same pass splits
+the text into sections at ``<h2>``/``<h3>`` headings.
+"""
+import html as htmllib
+import re
+from dataclasses import dataclass, field
+from typing import List, Optional, Tuple
+
+import lxml.html
+from lxml import etree
+
+_TITLE_RE = re.compile(r'<title[^>]*>(.*?)</title\s*>', re.I | re.S)
+_HREF_RE = re.compile(r'<a\s[^>]*?href\s*=\s*(?:"([^"]*)"|\'([^\']*)\'|([^\s>]+))', re.I)
+_CONTAINERS = ('main', 'article')
+# Scripts and styles can contain markup-like strings such as "<main>".
+_RAW_TEXT_RE = re.compile(r'<(script|style)\b.*?</\1\s*>', re.I | re.S)
+
+_DROP_TAGS = ('script', 'style', 'noscript', 'template', 'svg', 'button')
+BLOCK_TAGS = frozenset((
+    'address', 'article', 'aside', 'blockquote', 'br', 'dd', 'details', 'div', 'dl', 'dt',
+    'figcaption', 'figure', 'footer', 'form', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'header',
+    'hr', 'li', 'main', 'nav', 'ol', 'p', 'pre', 'section', 'summary', 'table', 'td', 'th',
+    'tr', 'ul',
+))
+SECTION_TAGS = ('h2', 'h3')
+_SPACES_RE = re.compile(r'[^\S\n]+')
+_BLANK_LINES_RE = re.compile(r'\s*\n\s*')
+# Marks where a section heading starts inside the extracted text
+# (private-use code points: lxml rejects control characters).
+_SECTION_MARK_RE = re.compile('\ue000(\\d+)\ue001')
+_SLUG_RE = re.compile(r'[^a-z0-9]+')
+
+
+@dataclass
+class Section:
+    """Text between two headings; the lead section has no heading."""
+    heading: str
+    anchor: Optional[str]
+    level: int
+    text: str
+
+
+@dataclass
+class ExtractedPage:
+    title: str = ''
+    text: str = ''
+    links: List[str] = field(default_factory=list)
+    sections: List[Section] = field(default_factory=list)
+
+
+def extract_title(html: str) -> str:
+    m = _TITLE_RE.search(html)
+    return ' '.join(htmllib.unescape(m.group(1)).split()) if m else ''
+
+
+def extract_links(html: str) -> List[str]:
+    """Every ``<a href>`` in the document, unescaped, in document order."""
+    return [htmllib.unescape(next(g for g in m.groups() if g is not None))
+            for m in _HREF_RE.finditer(html)]
+
+
+def _slice_container(html: str, tag: str) -> Optional[str]:
+    start = re.search(rf'<{tag}[\s>]', html, re.I)
+    if not start:
+        return None
+    end = html.lower().rfind(f'</{tag}>')
+    if end < start.start():
+        return html[start.start():]
+    return html[start.start():end + len(tag) + 3]
+
+
+def parse_main(html: str) -> Optional[lxml.html.HtmlElement]:
+    """Parse just the main content subtree of a page.
+
+    Falls back to ``div.content`` and finally the ``<body>`` of the whole
+    document when the page has no ``<main>``/``<article>`` element.
+    """
+    if not html or not html.strip():
+        return None
+    html = _RAW_TEXT_RE.sub('', html)
+    for tag in _CONTAINERS:
+        fragment = _slice_container(html, tag)
+        if fragment:
+            try:
+                return lxml.html.fragment_fromstring(fragment, create_parent='div')
+            except (etree.ParserError, ValueError):
+                continue
+    try:
+        doc = lxml.html.document_fromstring(html)
+    except (etree.ParserError, ValueError):
+        return None
+    content = doc.xpath('//div[contains(concat(" ", normalize-space(@class), " "), " content ")]')
+    if content:
+        return content[0]
+    body = doc.find('body')
+    return body if body is not None else doc
+
+
+def _clean(text: str) -> str:
+    return _BLANK_LINES_RE.sub('\n', _SPACES_RE.sub(' ', text)).strip()
+
+
+def _anchor(heading: lxml.html.HtmlElement, text: str) -> str:
+    anchor = heading.get('id')
+    if not anchor:
+        ids = heading.xpath('.//@id | .//a[starts-with(@href, "#")]/@href')
+        anchor = ids[0].lstrip('#') if ids else ''
+    return anchor or _SLUG_RE.sub('-', text.lower()).strip('-')
+
+
+def element_text(el: lxml.html.HtmlElement) -> str:
+    """Readable text of ``el``: one line per block element, single spaces within lines.
+
+    The element is modified in place (scripts removed, block boundaries marked).
+    """
+    return _SECTION_MARK_RE.sub('', _marked_text(el, ()))
+
+
+def _marked_text(el: lxml.html.HtmlElement, headings) -> str:
+    etree.strip_elements(el, *_DROP_TAGS, with_tail=False)
+    etree.strip_elements(el, etree.Comment, with_tail=False)
+    for i, heading in enumerate(headings):
+        heading.text = f'\ue000{i}\ue001' + (heading.text or '')
+    for node in el.iter(*BLOCK_TAGS):
+        node.text = '\n' + (node.text or '')
+        node.tail = '\n' + (node.tail or '')
+    return _clean(el.text_content())
+
+
+def split_sections(el: lxml.html.HtmlElement) -> Tuple[str, List[Section]]:
+    """Text of ``el`` and the same text split at its h2/h3 headings.
+
+    The element is modified in place, like ``element_text``.
+    """
+    headings = [h for h in el.iter(*SECTION_TAGS)]
+    meta = []
+    for h in headings:
+        heading_text = ' '.join(h.text_content().split())
+        meta.append((heading_text, _anchor(h, heading_text), int(h.tag[1])))
+    parts = _SECTION_MARK_RE.split(_marked_text(el, headings))
+    sections = []
+    if parts[0].strip():
+        sections.append(Section(heading='', anchor=None, level=1, text=parts[0].strip()))
+    for index, body in zip(parts[1::2], parts[2::2]):
+        heading_text, anchor, level = meta[int(index)]
+        body = body.strip()
+        if body:
+            sections.append(Section(heading=heading_text, anchor=anchor, level=level, text=body))
+    return '\n'.join(s.text for s in sections), sections
+
+
+def extract_page(html: str) -> ExtractedPage:
+    """Title, main-content text, sections and links of an HTML page."""
+    main = parse_main(html)
+    text, sections = split_sections(main) if main is not None else ('', [])
+    return ExtractedPage(
+        title=extract_title(html),
+        text=text,
+        links=extract_links(html),
+        sections=sections,
+    )
@@ -1,70 +1,144 @@
 """Fetch or mirror portions of flutter docs.
 
-This module fetches key Flutter documentation pages and API references.
+This module crawls the Flutter documentation site (seeded from its sitemap)
+and returns structured page data. Pages are downloaded concurrently through
+``fetch.engine`` and the crawl frontier is kept by ``fetch.docs_crawler``.
 """
-from typing import List, Dict
-import requests
-from bs4 import BeautifulSoup
+from typing import Dict, Iterator, List, Optional, Tuple
+from urllib.parse import urlsplit
 import logging
-import re
+import os
+
+from fetch.chunks import build_chunks
+from fetch.docs_crawler import DocsCrawler, canonicalize
+from fetch.engine import fetch_all
+from fetch.extract import extract_page
 
 LOG = logging.getLogger(__name__)
 
-def update_flutter_docs() -> List[Dict]:
-    """Fetch key Flutter documentation pages and return structured data."""
-    urls = [
-        {
-            "url": "https://docs.flutter.dev/",
-            "title": "Flutter Documentation Home",
-            "id": "flutter-docs-home"
-        },
-        {
-            "url": "https://docs.flutter.dev/get-started/install",
-            "title": "Flutter Installation Guide",
-            "id": "flutter-install"
-        },
-        {
-            "url": "https://docs.flutter.dev/development/ui/widgets",
-            "title": "Flutter Widgets",
-            "id": "flutter-widgets"
-        },
-        {
-            "url": "https://docs.flutter.dev/development/ui/widgets-intro",
-            "title": "Introduction to Widgets",
-            "id": "widgets-intro"
-        }
-    ]
-    
+# 0 crawls the whole site; a positive value caps the pages fetched per run and
+# leaves the rest of the frontier for the next run.
+DOCS_MAX_PAGES = int(os.getenv('DOCS_MAX_PAGES', '0'))
+
+# Key pages keep the ids and titles they had before the full-site crawl.
+KEY_DOCS = {
+    "https://docs.flutter.dev/": {
+        "title": "Flutter Documentation Home",
+        "id": "flutter-docs-home"
+    },
+    "https://docs.flutter.dev/get-started/install": {
+        "title": "Flutter Installation Guide",
+        "id": "flutter-install"
+    },
+    "https://docs.flutter.dev/development/ui/widgets": {
+        "title": "Flutter Widgets",
+        "id": "flutter-widgets"
+    },
+    "https://docs.flutter.dev/development/ui/widgets-intro": {
+        "title": "Introduction to Widgets",
+        "id": "widgets-intro"
+    }
+}
+
+
+def key_doc(url: str, requested: Optional[str] = None) -> Dict:
+    """The ``KEY_DOCS`` entry of a page, looked up by the URL requested before any redirect first."""
+    return KEY_DOCS.get(requested or url) or KEY_DOCS.get(url) or {}
+
+
+def doc_id(url: str, requested: Optional[str] = None) -> str:
+    """Stable row id for a docs URL; ``requested`` is the URL fetched when ``url`` is a redirect target."""
+    key = key_doc(url, requested)
+    if key:
+        return key["id"]
+    path = urlsplit(url).path.strip('/')
+    return 'docs-' + (path.replace('/', '-') or 'home')
+
+
+def parse_doc_page(url: str, html: str, requested: Optional[str] = None) -> Tuple[Optional[Dict], List[str]]:
+    """Build a ``flutter_docs`` row from a page and collect its outgoing links.
+
+    A key page that redirects keeps the id and title of the URL requested.
+    The page's section chunks ride along under the private ``_chunks`` key
+    until ``iter_doc_batches`` splits them off.
+    """
+    page = extract_page(html)
+    content = page.text
+    if not content:
+        return None, page.links
+
+    title = key_doc(url, requested).get("title")
+    if not title:
+        title = page.title.removesuffix(' | Flutter').strip() or url
+
+    # Create summary (first 500 chars)
+    summary = content[:500] + "..." if len(content) > 500 else content
+
+    row_id = doc_id(url, requested)
+    return {
+        "id": row_id,
+        "title": title,
+        "url": url,
+        "summary": summary,
+        "content": content,
+        "_chunks": build_chunks(row_id, url, title, page.sections),
+    }, page.links
+
+
+def docs_crawler(max_pages: int = DOCS_MAX_PAGES) -> DocsCrawler:
+    seeds = [canonicalize(url) for url in KEY_DOCS]
+    return DocsCrawler(parse=parse_doc_page, seeds=[s for s in seeds if s], max_pages=max_pages)
+
+
+def iter_doc_batches(max_pages: int = DOCS_MAX_PAGES,
+                     crawler: Optional[DocsCrawler] = None) -> Iterator[Tuple[List[Dict], List[Dict]]]:
+    """Crawl the docs site, yielding ``(doc rows, chunk rows)`` batches.
+
+    Pass the doc rows that were stored to ``crawler.confirm``; pages left
+    unconfirmed are fetched again in full by the next crawl.
+    """
+    crawler = crawler or docs_crawler(max_pages)
+    for batch in crawler.crawl():
+        chunks = [chunk for row in batch for chunk in row.pop("_chunks", [])]
+        LOG.info("Fetched %d Flutter docs pages (%d chunks)", len(batch), len(chunks))
+        yield batch, chunks
+
+
+def iter_flutter_docs(max_pages: int = DOCS_MAX_PAGES) -> Iterator[List[Dict]]:
+    """Crawl the docs site, yielding batches of page rows (see ``iter_doc_batches``)."""
+    for docs, _ in iter_doc_batches(max_pages):
+        yield docs
+
+
+def fetch_key_docs() -> List[Dict]:
+    """Fetch the ``KEY_DOCS`` pages in full, without touching the crawl frontier."""
     out = []
-    for doc in urls:
+    for url, res in zip(KEY_DOCS, fetch_all(KEY_DOCS)):
+        if not res.ok:
+            LOG.warning("Failed to fetch %s: %s", url, res.error or f"HTTP {res.status}")
+            continue
         try:
-            r = requests.get(doc["url"], timeout=15)
-            r.raise_for_status()
-            
-            # Parse HTML content
-            soup = BeautifulSoup(r.text, 'html.parser')
-            
-            # Extract main content
-            main_content = soup.find('main') or soup.find('article') or soup.find('div', class_='content')
-            if main_content:
-                content = main_content.get_text(strip=True)
-            else:
-                content = soup.get_text(strip=True)
-            
-            # Create summary (first 500 chars)
-            summary = content[:500] + "..." if len(content) > 500 else content
-            
-            out.append({
-                "id": doc["id"],
-                "title": doc["title"],
-                "url": doc["url"],
-                "summary": summary,
-                "content": content,
-            })
-            
-            LOG.info(f"Fetched Flutter doc: {doc['title']}")
-            
+            row, _ = parse_doc_page(canonicalize(res.final_url or url) or url, res.text, url)
         except Exception as e:
-            LOG.warning("Failed to fetch %s: %s", doc["url"], e)
-    
+            LOG.warning("Failed to parse %s: %s", url, e)
+            continue
+        if row:
+            row.pop("_chunks", None)
+            out.append(row)
+            LOG.info("Fetched Flutter doc: %s", row["title"])
+    return out
+
+
+def update_flutter_docs(max_pages: Optional[int] = None) -> List[Dict]:
+    """Fetch key Flutter documentation pages and return structured data.
+
+    Passing ``max_pages`` (0 = no cap) crawls the whole site instead. The
+    rows are only returned, not confirmed, so the crawl fetches them in full
+    again next time; the sync job stores crawls through ``iter_doc_batches``.
+    """
+    if max_pages is None:
+        return fetch_key_docs()
+    out = []
+    for batch in iter_flutter_docs(max_pages):
+        out.extend(batch)
     return out
@@ -0,0 +1,186 @@
+"""GitHub API rate-limit budget shared by every request made with the token.
+
+GitHub reports the quota in ``X-RateLimit-Limit``/``-Remaining``/``-Reset``
+on every response. The budget tracks those numbers and decides, before each
+request, whether it may go now, should wait (to spread the remaining quota
+over the rest of the window, or for the window to reset), or should be given
+up because the wait would be longer than a run can afford. Low-priority work
+is refused early so high-priority work still has quota left. GraphQL queries
+also ask for ``rateLimit { cost remaining resetAt }``, which gives the cost
+of each query to reserve the next time it runs.
+"""
+import logging
+import os
+import threading
+import time
+from datetime import datetime
+from typing import Dict, Mapping, Optional
+
+LOG = logging.getLogger(__name__)
+
+# Points left untouched for other clients of the same token.
+GITHUB_RATE_RESERVE = int(os.getenv('GITHUB_RATE_RESERVE', '100'))
+# Below this fraction of the quota, requests are spread over the reset window.
+GITHUB_PACE_BELOW = float(os.getenv('GITHUB_PACE_BELOW', '0.5'))
+# Below this fraction of the quota, low-priority requests are refused.
+GITHUB_LOW_PRIORITY_FLOOR = float(os.getenv('GITHUB_LOW_PRIORITY_FLOOR', '0.25'))
+# Longest a run will wait for the quota to reset before giving up.
+GITHUB_MAX_WAIT = float(os.getenv('GITHUB_MAX_WAIT', '900'))
+
+HIGH, LOW = 0, 1
+
+
+def _int_header(headers: Mapping[str, str], name: str) -> Optional[int]:
+    try:
+        return int(headers.get(name))
+    except (TypeError, ValueError):
+        return None
+
+
+def _timestamp(value: str) -> Optional[float]:
+    try:
+        return datetime.fromisoformat(value.replace('Z', '+00:00')).timestamp()
+    except (AttributeError, ValueError):
+        return None
+
+
+class RateBudget:
+    """Quota shared by concurrent callers.
+
+    ``delay`` reserves a request's expected cost under the lock before it is
+    sent, so callers see each other's requests in flight, and paced callers
+    get consecutive slots instead of all sleeping the same interval. Once the
+    response arrives, ``settle`` releases the reservation and takes the quota
+    GitHub reported, less what is still in flight.
+    """
+
+    def __init__(self, reserve: int = GITHUB_RATE_RESERVE, pace_below: float = GITHUB_PACE_BELOW,
+                 low_priority_floor: float = GITHUB_LOW_PRIORITY_FLOOR, max_wait: float = GITHUB_MAX_WAIT):
+        self.reserve = reserve
+        self.pace_below = pace_below
+        self.low_priority_floor = low_priority_floor
+        self.max_wait = max_wait
+        self.limit: Optional[int] = None
+        self.remaining: Optional[int] = None
+        self.reset_at: Optional[float] = None
+        self.in_flight = 0
+        self.counters = {'requests': 0, 'paced': 0, 'waits': 0, 'refused': 0, 'wait_sec': 0.0}
+        self._reported: Optional[int] = None
+        self._next_slot = 0.0
+        self._lock = threading.Lock()
+
+    def update(self, headers: Optional[Mapping[str, str]] = None, rate_limit: Optional[Mapping] = None) -> None:
+        """Take the quota reported by a response's rate-limit headers or GraphQL ``rateLimit``."""
+        if rate_limit and rate_limit.get('remaining') is not None and rate_limit.get('resetAt'):
+            limit, remaining = rate_limit.get('limit'), rate_limit['remaining']
+            reset = _timestamp(rate_limit['resetAt'])
+        elif headers is not None:
+            limit = _int_header(headers, 'x-ratelimit-limit')
+            remaining = _int_header(headers, 'x-ratelimit-remaining')
+            reset = _int_header(headers, 'x-ratelimit-reset')
+        else:
+            return
+        if remaining is None or reset is None:
+            return
+        with self._lock:
+            if self.reset_at is not None and reset == self.reset_at and self._reported is not None:
+                # Concurrent responses arrive out of order; the lowest count is the latest.
+                remaining = min(remaining, self._reported)
+            self.limit, self._reported, self.reset_at = limit or self.limit, remaining, float(reset)
+            self.remaining = remaining - self.in_flight
+
+    def settle(self, cost: int, headers: Optional[Mapping[str, str]] = None,
+               rate_limit: Optional[Mapping] = None) -> None:
+        """Release the ``cost`` reserved by ``delay`` and take the reported quota, if any.
+
+        Without a report (the request failed) the points stay spent until the
+        next response says otherwise.
+        """
+        with self._lock:
+            self.in_flight = max(0, self.in_flight - cost)
+        self.update(headers, rate_limit)
+
+    def exhaust(self, reset_at: Optional[float] = None) -> None:
+        """Record that GitHub refused a request for lack of quota."""
+        with self._lock:
+            self.remaining = self._reported = 0
+            if reset_at is not None:
+                self.reset_at = reset_at
+
+    def delay(self, priority: int = HIGH, cost: int = 1) -> Optional[float]:
+        """Seconds to wait before a request costing ``cost`` points, or ``None`` to give it up.
+
+        Unless it is given up, the request's cost is reserved; pass it to
+        ``settle`` once the request is done.
+        """
+        with self._lock:
+            self.counters['requests'] += 1
+            if self.remaining is None or self.reset_at is None:
+                return self._take(cost, 0.0)
+            now = time.time()
+            window = self.reset_at - now
+            if window <= 0:
+                # The window rolled over; the next response brings the new numbers.
+                self._reported = self.limit
+                self.remaining = (self.limit or 0) - self.in_flight
+                self._next_slot = 0.0
+                return self._take(cost, 0.0)
+            limit = self.limit or self.remaining
+            if priority == LOW and self.remaining < limit * self.low_priority_floor:
+                self.counters['refused'] += 1
+                return None
+            spare = self.remaining - self.reserve
+            if spare < cost:
+                wait = window + 1
+                if wait > self.max_wait:
+                    self.counters['refused'] += 1
+                    return None
+                self.counters['waits'] += 1
+                self.counters['wait_sec'] += wait
+                return self._take(cost, wait)
+            if self.remaining - cost < limit * self.pace_below:
+                # Spread the spare points over the window: each request takes
+                # the next free slot after those already handed out.
+                slot = max(now, self._next_slot) + window * cost / spare
+                wait = slot - now
+                if wait > self.max_wait:
+                    self.counters['refused'] += 1
+                    return None
+                self._next_slot = slot
+                self.counters['paced'] += 1
+                self.counters['wait_sec'] += wait
+                return self._take(cost, wait)
+            return self._take(cost, 0.0)
+
+    def _take(self, cost: int, wait: float) -> float:
+        self.in_flight += cost
+        if self.remaining is not None:
+            self.remaining -= cost
+        return wait
+
+    def stats(self) -> Dict:
+        """Quota metric: limit, remaining, seconds until reset, and request counters."""
+        with self._lock:
+            reset_in = max(0.0, self.reset_at - time.time()) if self.reset_at else None
+            return {'limit': self.limit, 'remaining': self.remaining, 'reset_in_sec': reset_in, **self.counters}
+
+    def log_stats(self) -> None:
+        s = self.stats()
+        if s['remaining'] is None:
+            return
+        LOG.info('GitHub quota: %s/%s left, resets in %.0fs; %d requests, %d paced, %d waited, '
+                 '%d refused, %.1fs waiting', s['remaining'], s['limit'], s['reset_in_sec'] or 0,
+                 s['requests'], s['paced'], s['waits'], s['refused'], s['wait_sec'])
+
+
+_budget: Optional[RateBudget] = None
+_budget_lock = threading.Lock()
+
+
+def get_github_budget() -> RateBudget:
+    """The process-wide budget for ``GITHUB_TOKEN``."""
+    global _budget
+    with _budget_lock:
+        if _budget is None:
+            _budget = RateBudget()
+        return _budget
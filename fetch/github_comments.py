@@ -0,0 +1,244 @@
+"""Stream the comments of GitHub issues with new activity.
+
+Every synced issue reports its comment count. ``CommentCursors`` remembers,
+per issue, how many comments have been ingested and the GraphQL cursor of
+the last one, so an issue is only revisited when its count moves, and then
+only the comments after the cursor are read. Issues waiting for comments
+form a backlog that survives between runs: a run that runs short of rate
+budget (comments are low priority) leaves the rest for the next one.
+
+Comments are read a page of 100 at a time and yielded in bounded batches, so
+memory does not depend on how long a thread is.
+"""
+import asyncio
+import logging
+import os
+import threading
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+from fetch.github_budget import LOW
+from fetch.github_graphql import GH_TOKEN, GitHubError, GitHubGraphQL, GitHubRateLimited
+from utils.state import connect
+
+LOG = logging.getLogger(__name__)
+
+GITHUB_COMMENT_CONCURRENCY = int(os.getenv('GITHUB_COMMENT_CONCURRENCY', '4'))
+GITHUB_COMMENT_BATCH = int(os.getenv('GITHUB_COMMENT_BATCH', '500'))
+PER_PAGE = 100
+
+COMMENTS_QUERY = """
+query($owner: String!, $name: String!, $number: Int!, $cursor: String, $perPage: Int!) {
+  repository(owner: $owner, name: $name) {
+    issue(number: $number) {
+      comments(first: $perPage, after: $cursor) {
+        totalCount
+        pageInfo { hasNextPage endCursor }
+        nodes {
+          databaseId body url createdAt updatedAt
+          author { login }
+          reactions { totalCount }
+        }
+      }
+    }
+  }
+  rateLimit { cost limit remaining resetAt }
+}
+"""
+
+# (issue id, repo, issue number, cursor of the last ingested comment)
+Pending = Tuple[str, str, int, Optional[str]]
+
+
+class CommentCursors:
+    def __init__(self, name: str = 'github_comments.db'):
+        self._lock = threading.Lock()
+        self.conn = connect(name)
+        self.conn.execute(
+            'create table if not exists issue_comments ('
+            ' issue_id text primary key,'
+            ' repo text not null,'
+            ' number int not null,'
+            ' cursor text,'
+            ' fetched int not null default 0,'
+            ' total int not null)'
+        )
+        self.conn.commit()
+
+    def note_issues(self, rows: Iterable[Dict]) -> None:
+        """Record the comment counts of synced issue rows."""
+        items = [(row['id'], row['repo'], row['issue_number'], row.get('comment_count') or 0)
+                 for row in rows if row.get('repo') and row.get('issue_number') is not None]
+        with self._lock, self.conn:
+            self.conn.executemany(
+                'insert into issue_comments (issue_id, repo, number, total) values (?, ?, ?, ?)'
+                ' on conflict(issue_id) do update set repo = excluded.repo, number = excluded.number,'
+                ' total = excluded.total',
+                items,
+            )
+
+    def pending(self) -> List[Pending]:
+        """Issues whose comment count differs from what was ingested."""
+        with self._lock:
+            cur = self.conn.execute(
+                'select issue_id, repo, number, cursor from issue_comments where total != fetched order by rowid'
+            )
+            return cur.fetchall()
+
+    def advance(self, progress: Dict[str, Tuple[Optional[str], Optional[int]]]) -> None:
+        """Store ``{issue_id: (cursor, fetched)}``; ``fetched=None`` keeps the count (issue unfinished)."""
+        with self._lock, self.conn:
+            self.conn.executemany(
+                'update issue_comments set cursor = ?, fetched = coalesce(?, fetched) where issue_id = ?',
+                [(cursor, fetched, issue_id) for issue_id, (cursor, fetched) in progress.items()],
+            )
+
+    def forget(self, issue_ids: Iterable[str]) -> None:
+        with self._lock, self.conn:
+            self.conn.executemany('delete from issue_comments where issue_id = ?', [(i,) for i in issue_ids])
+
+
+def comment_row(node: Dict, issue_id: str, repo: str) -> Dict:
+    return {
+        'id': f"ghc-{node['databaseId']}",
+        'issue_id': issue_id,
+        'repo': repo,
+        'author': (node.get('author') or {}).get('login'),
+        'body': node.get('body') or '',
+        'url': node.get('url'),
+        'reactions': (node.get('reactions') or {}).get('totalCount', 0),
+        'created_at': node.get('createdAt'),
+        'updated_at': node.get('updatedAt'),
+    }
+
+
+class IssueCommentSync:
+    """Fetch new comments for every issue in the backlog, in bounded batches.
+
+    Call ``note_issues`` with the issue rows that were stored, then iterate
+    ``batches()`` and pass the comment rows that were stored to ``confirm``.
+    ``commit()`` then moves each issue's cursor past its last page whose
+    comments, and those of every page before it, were all stored.
+    """
+
+    def __init__(self, cursors: Optional[CommentCursors] = None,
+                 concurrency: int = GITHUB_COMMENT_CONCURRENCY, batch_size: int = GITHUB_COMMENT_BATCH):
+        self.cursors = cursors or CommentCursors()
+        self.concurrency = max(1, concurrency)
+        self.batch_size = batch_size
+        # Per issue, in order: (comment ids, cursor, fetched) of each page read.
+        self.pages: Dict[str, List[Tuple[List[str], Optional[str], Optional[int]]]] = {}
+        self.stored: Set[str] = set()
+        self.gone: List[str] = []
+        self._lock = threading.Lock()
+
+    def note_issues(self, rows: Iterable[Dict]) -> None:
+        self.cursors.note_issues(rows)
+
+    def confirm(self, rows: Iterable[Dict]) -> None:
+        """Record yielded comment ``rows`` as stored; may be called from writer threads."""
+        with self._lock:
+            self.stored.update(str(row['id']) for row in rows)
+
+    async def _worker(self, gh: GitHubGraphQL, items: Iterator[Pending], queue: asyncio.Queue,
+                      stop: asyncio.Event) -> None:
+        try:
+            for issue_id, repo, number, cursor in items:
+                if stop.is_set():
+                    break
+                owner, name = repo.split('/', 1)
+                try:
+                    while True:
+                        data = await gh.query(COMMENTS_QUERY, {
+                            'owner': owner, 'name': name, 'number': number, 'cursor': cursor,
+                            'perPage': PER_PAGE,
+                        }, priority=LOW)
+                        issue = (data.get('repository') or {}).get('issue')
+                        if issue is None:
+                            await queue.put((issue_id, None, None, None))
+                            break
+                        comments = issue['comments']
+                        info = comments['pageInfo']
+                        cursor = info['endCursor'] or cursor
+                        rows = [comment_row(node, issue_id, repo) for node in comments['nodes']
+                                if node and node.get('databaseId')]
+                        done = not info['hasNextPage']
+                        await queue.put((issue_id, rows, cursor, comments['totalCount'] if done else None))
+                        if done:
+                            break
+                except GitHubRateLimited as e:
+                    LOG.warning('Stopping comment fetch early: %s', e)
+                    stop.set()
+                except GitHubError as e:
+                    if 'NOT_FOUND' in e.error_types:
+                        # Deleted, transferred or not an issue: drop it from the backlog.
+                        await queue.put((issue_id, None, None, None))
+                    else:
+                        LOG.error('Error fetching comments of %s#%s: %s', repo, number, e)
+        except Exception as e:
+            LOG.exception('Unexpected error fetching comments: %s', e)
+        # Not in a finally: a cancelled worker must not block on a full queue.
+        await queue.put(None)
+
+    def batches(self) -> Iterator[List[Dict]]:
+        """Yield ``github_issue_comments`` rows in batches of ``batch_size`` plus at most one page."""
+        pending = self.cursors.pending()
+        if not pending:
+            return
+        if not GH_TOKEN:
+            LOG.warning('GITHUB_TOKEN not set; skipping GitHub comments fetch.')
+            return
+        LOG.info('Fetching comments for %d issues with new activity', len(pending))
+        loop = asyncio.new_event_loop()
+        gh = GitHubGraphQL(GH_TOKEN)
+        loop.run_until_complete(gh.__aenter__())
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self.concurrency)
+        stop = asyncio.Event()
+        items = iter(pending)
+        workers = [loop.create_task(self._worker(gh, items, queue, stop)) for _ in range(self.concurrency)]
+        batch: List[Dict] = []
+        total = 0
+        try:
+            running = len(workers)
+            while running:
+                item = loop.run_until_complete(queue.get())
+                if item is None:
+                    running -= 1
+                    continue
+                issue_id, rows, cursor, fetched = item
+                if rows is None:
+                    self.gone.append(issue_id)
+                    continue
+                self.pages.setdefault(issue_id, []).append(([row['id'] for row in rows], cursor, fetched))
+                batch.extend(rows)
+                if len(batch) >= self.batch_size:
+                    total += len(batch)
+                    yield batch
+                    batch = []
+            total += len(batch)
+            if batch:
+                yield batch
+        finally:
+            for worker in workers:
+                worker.cancel()
+            loop.run_until_complete(asyncio.gather(*workers, return_exceptions=True))
+            loop.run_until_complete(gh.__aexit__(None, None, None))
+            loop.close()
+            LOG.info('Found %d new comments', total)
+
+    def commit(self) -> None:
+        """Remember how far each issue's comments were read and stored."""
+        with self._lock:
+            stored = set(self.stored)
+        progress: Dict[str, Tuple[Optional[str], Optional[int]]] = {}
+        held = 0
+        for issue_id, pages in self.pages.items():
+            for ids, cursor, fetched in pages:
+                if not all(i in stored for i in ids):
+                    held += 1
+                    break
+                progress[issue_id] = (cursor, fetched)
+        if held:
+            LOG.warning('%d issues had comments that were not stored; they are read again next run', held)
+        self.cursors.advance(progress)
+        self.cursors.forget(self.gone)
+        self.pages, self.stored, self.gone = {}, set(), []
@@ -0,0 +1,131 @@
+"""Minimal async client for the GitHub GraphQL API.
+
+One GraphQL request can return a hundred issues with their labels and
+reaction counts, where the REST API needs a page request plus a request per
+nested collection. Requests go through the per-host politeness scheduler,
+the token's rate-limit budget and the shared connection pool.
+"""
+import asyncio
+import logging
+import os
+from typing import Any, Dict, Iterable, Optional
+
+import httpx
+
+from fetch.engine import FETCH_TIMEOUT
+from fetch.github_budget import HIGH, RateBudget, get_github_budget
+from fetch.politeness import RequestScheduler, get_scheduler, retry_after_seconds
+from utils.transport import SharedTransport, get_transport
+
+LOG = logging.getLogger(__name__)
+
+GH_TOKEN = os.getenv('GITHUB_TOKEN')
+GITHUB_GRAPHQL_URL = 'https://api.github.com/graphql'
+# Attempts for a request GitHub turned away for rate limiting.
+RATE_LIMIT_ATTEMPTS = 3
+
+
+class GitHubError(Exception):
+    """A GraphQL request failed or returned errors; ``error_types`` holds their GraphQL types."""
+
+    def __init__(self, message: str, error_types: Iterable[str] = ()):
+        super().__init__(message)
+        self.error_types = frozenset(t for t in error_types if t)
+
+
+class GitHubRateLimited(GitHubError):
+    """The rate-limit budget cannot cover the request within this run."""
+
+
+def _json_body(r: httpx.Response) -> Optional[Dict[str, Any]]:
+    if r.status_code != 200:
+        return None
+    try:
+        body = r.json()
+    except ValueError:
+        return None
+    return body if isinstance(body, dict) else None
+
+
+class GitHubGraphQL:
+    """Use as ``async with GitHubGraphQL(token) as gh: data = await gh.query(...)``."""
+
+    def __init__(self, token: str, timeout: float = FETCH_TIMEOUT,
+                 scheduler: Optional[RequestScheduler] = None, budget: Optional[RateBudget] = None,
+                 transport: Optional[SharedTransport] = None):
+        self.token = token
+        self.timeout = httpx.Timeout(timeout, pool=None)
+        self.scheduler = scheduler or get_scheduler()
+        self.budget = budget or get_github_budget()
+        self.transport = transport or get_transport()
+        self._headers = {'Authorization': f'bearer {token}'}
+        # Points each query cost the last time, from its ``rateLimit { cost }``.
+        self._costs: Dict[str, int] = {}
+
+    async def __aenter__(self) -> 'GitHubGraphQL':
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        pass
+
+    async def query(self, query: str, variables: Optional[Dict[str, Any]] = None,
+                    priority: int = HIGH) -> Dict[str, Any]:
+        """Run ``query`` and return its ``data``; raise ``GitHubError`` on any error.
+
+        ``GitHubRateLimited`` means the budget gave up on the request, either
+        because ``priority`` is low and quota is short or because the quota
+        would not reset in time.
+        """
+        payload = {'query': query, 'variables': variables or {}}
+
+        async def send() -> httpx.Response:
+            return await self.transport.arequest('POST', GITHUB_GRAPHQL_URL, json=payload, headers=self._headers,
+                                                 timeout=self.timeout)
+
+        for _ in range(RATE_LIMIT_ATTEMPTS):
+            cost = self._costs.get(query, 1)
+            delay = self.budget.delay(priority, cost)
+            if delay is None:
+                raise GitHubRateLimited(f'GitHub quota too low ({self.budget.remaining} left)')
+            try:
+                if delay:
+                    LOG.info('Waiting %.1fs for GitHub quota (%s left)', delay, self.budget.remaining)
+                    await asyncio.sleep(delay)
+                r = await self.scheduler.arun(GITHUB_GRAPHQL_URL, send)
+            except BaseException as e:
+                # Failed or cancelled: release the reservation, nothing to reconcile with.
+                self.budget.settle(cost)
+                if isinstance(e, httpx.HTTPError):
+                    raise GitHubError(f'{type(e).__name__}: {e}') from e
+                raise
+            body = _json_body(r)
+            rate_limit = (body.get('data') or {}).get('rateLimit') if body else None
+            if rate_limit and rate_limit.get('cost'):
+                self._costs[query] = rate_limit['cost']
+            self.budget.settle(cost, r.headers, rate_limit)
+            retry_after = retry_after_seconds(r.headers)
+            if r.status_code == 429 or (r.status_code == 403 and (
+                    retry_after is not None or r.headers.get('x-ratelimit-remaining') == '0')):
+                # Primary limit: the budget now waits for the reset. Secondary
+                # limit: GitHub says how long to back off.
+                if retry_after is None:
+                    self.budget.exhaust()
+                    continue
+                if retry_after > self.budget.max_wait:
+                    raise GitHubRateLimited(f'GitHub asked to retry after {retry_after:.0f}s')
+                LOG.info('GitHub secondary rate limit; retrying in %.1fs', retry_after)
+                await asyncio.sleep(retry_after)
+                continue
+            if r.status_code != 200:
+                raise GitHubError(f'HTTP {r.status_code}: {r.text[:200]}')
+            if body is None:
+                raise GitHubError(f'Invalid JSON response: {r.text[:200]}')
+            errors = body.get('errors') or []
+            if any(err.get('type') == 'RATE_LIMITED' for err in errors):
+                self.budget.exhaust()
+                continue
+            if errors:
+                raise GitHubError('; '.join(err.get('message', str(err)) for err in errors),
+                                  (err.get('type') for err in errors))
+            return body.get('data') or {}
+        raise GitHubRateLimited('GitHub rate limit persisted after retries')
@@ -1,30 +1,206 @@
-"""Fetch recent issues from the flutter/flutter GitHub repository."""
-from typing import List, Dict
-from github import Github
+"""Fetch issues from the Flutter ecosystem's GitHub repositories.
+
+Issues are read through the GraphQL API a hundred at a time, labels, state,
+timestamps and reaction counts included, and streamed out page by page.
+``IncrementalIssueSync`` only asks for issues updated since the previous
+run, closed ones included, so a steady-state run costs a few requests.
+Repositories listed in ``GITHUB_REPOS`` are fetched concurrently.
+"""
+from typing import AsyncIterator, Dict, Iterable, Iterator, List, Mapping, Optional, Sequence, Set, Tuple
+import asyncio
 import os, logging
+import threading
+
+from fetch.github_graphql import GH_TOKEN, GitHubError, GitHubGraphQL, GitHubRateLimited
+from utils.state import HighWaterMarks
 
 LOG = logging.getLogger(__name__)
-GH_TOKEN = os.getenv('GITHUB_TOKEN')
+GITHUB_REPO = 'flutter/flutter'
+# e.g. "flutter/flutter,flutter/flutter-intellij,dart-lang/sdk"
+GITHUB_REPOS = [r.strip() for r in os.getenv('GITHUB_REPOS', GITHUB_REPO).split(',') if r.strip()]
+GITHUB_MAX_PAGES = int(os.getenv('GITHUB_MAX_PAGES', '0'))  # 0 = every page
+PER_PAGE = 100
 
-def update_github_issues() -> List[Dict]:
-    out = []
+ISSUES_QUERY = """
+query($owner: String!, $name: String!, $cursor: String, $states: [IssueState!], $since: DateTime,
+      $perPage: Int!) {
+  repository(owner: $owner, name: $name) {
+    issues(first: $perPage, after: $cursor, filterBy: {states: $states, since: $since},
+           orderBy: {field: UPDATED_AT, direction: ASC}) {
+      pageInfo { hasNextPage endCursor }
+      nodes {
+        databaseId number title body url state createdAt updatedAt
+        labels(first: 50) { nodes { name } }
+        reactions { totalCount }
+        comments { totalCount }
+      }
+    }
+  }
+  rateLimit { cost limit remaining resetAt }
+}
+"""
+
+
+def issue_row(node: Dict, repo: str = GITHUB_REPO) -> Dict:
+    return {
+        # databaseId is the REST issue id, so rows keep the ids PyGithub gave them.
+        'id': f"gh-{node['databaseId']}",
+        'title': node.get('title') or '',
+        'issue_number': node.get('number'),
+        'labels': [label['name'] for label in (node.get('labels') or {}).get('nodes') or [] if label],
+        'body': node.get('body') or '',
+        'url': node.get('url'),
+        'state': (node.get('state') or '').lower(),
+        'created_at': node.get('createdAt'),
+        'updated_at': node.get('updatedAt'),
+        'reactions': (node.get('reactions') or {}).get('totalCount', 0),
+        'comment_count': (node.get('comments') or {}).get('totalCount', 0),
+        'repo': repo,
+    }
+
+
+async def iter_issue_pages(gh: GitHubGraphQL, repo: str = GITHUB_REPO,
+                           states: Optional[Sequence[str]] = ('OPEN',), since: Optional[str] = None,
+                           max_pages: int = GITHUB_MAX_PAGES) -> AsyncIterator[List[Dict]]:
+    """Yield one list of issue rows per GraphQL page, least recently updated first.
+
+    ``states=None`` returns open and closed issues; ``since`` (ISO 8601) keeps
+    only issues updated at or after that time.
+    """
+    owner, name = repo.split('/', 1)
+    cursor: Optional[str] = None
+    pages = 0
+    while True:
+        data = await gh.query(ISSUES_QUERY, {
+            'owner': owner, 'name': name, 'cursor': cursor, 'perPage': PER_PAGE,
+            'states': list(states) if states else None, 'since': since,
+        })
+        issues = (data.get('repository') or {}).get('issues')
+        if issues is None:
+            raise GitHubError(f'Repository {repo} not found')
+        yield [issue_row(node, repo) for node in issues['nodes'] if node and node.get('databaseId')]
+        pages += 1
+        info = issues['pageInfo']
+        if not info['hasNextPage'] or (max_pages and pages >= max_pages):
+            return
+        cursor = info['endCursor']
+
+
+async def _pump_repo(gh: GitHubGraphQL, repo: str, since: Optional[str], max_pages: int,
+                     queue: 'asyncio.Queue[Tuple[str, Optional[List[Dict]]]]') -> None:
+    """Feed the pages of one repository into ``queue``, then a ``None`` end marker."""
+    total = 0
+    try:
+        if since:
+            LOG.info('Fetching %s issues updated since %s', repo, since)
+        # Without a cursor only open issues are read; closed history is not ingested.
+        states = None if since else ('OPEN',)
+        async for rows in iter_issue_pages(gh, repo, states=states, since=since, max_pages=max_pages):
+            total += len(rows)
+            await queue.put((repo, rows))
+    except GitHubRateLimited as e:
+        LOG.warning('Stopping %s issue fetch early: %s', repo, e)
+    except GitHubError as e:
+        LOG.error('Error fetching GitHub issues from %s: %s', repo, e)
+    except Exception as e:
+        # Any other failure still has to end this repository's stream.
+        LOG.exception('Unexpected error fetching GitHub issues from %s: %s', repo, e)
+    # Not in a finally: a cancelled task must not block on a full queue.
+    LOG.info('Found %d issues from %s', total, repo)
+    await queue.put((repo, None))
+
+
+def iter_github_issue_batches(since: Mapping[str, Optional[str]],
+                              max_pages: int = GITHUB_MAX_PAGES) -> Iterator[Tuple[str, List[Dict]]]:
+    """Fetch several repositories concurrently, yielding ``(repo, rows)`` pages as they arrive.
+
+    ``since`` maps each repository to the update time to resume from, or to
+    ``None`` for its open issues. All repositories share one GraphQL client and
+    the token's rate budget; at most one page per repository is buffered.
+    """
     if not GH_TOKEN:
         LOG.warning('GITHUB_TOKEN not set; skipping GitHub fetch.')
-        return out
+        return
+    if not since:
+        return
+    loop = asyncio.new_event_loop()
+    gh = GitHubGraphQL(GH_TOKEN)
+    loop.run_until_complete(gh.__aenter__())
+    queue: asyncio.Queue = asyncio.Queue(maxsize=len(since))
+    tasks = [loop.create_task(_pump_repo(gh, repo, cursor, max_pages, queue)) for repo, cursor in since.items()]
     try:
-        gh = Github(GH_TOKEN)
-        repo = gh.get_repo('flutter/flutter')
-        issues = repo.get_issues(state='open')[:100]
-        for issue in issues:
-            out.append({
-                'id': f'gh-{issue.id}',
-                'title': issue.title,
-                'issue_number': issue.number,
-                'labels': [l.name for l in issue.labels],
-                'body': issue.body or '',
-                'url': issue.html_url,
-                'created_at': issue.created_at.isoformat(),
-            })
-    except Exception as e:
-        LOG.exception('Error fetching GitHub issues: %s', e)
+        running = len(tasks)
+        while running:
+            repo, rows = loop.run_until_complete(queue.get())
+            if rows is None:
+                running -= 1
+                continue
+            yield repo, rows
+    finally:
+        for task in tasks:
+            task.cancel()
+        loop.run_until_complete(asyncio.gather(*tasks, return_exceptions=True))
+        loop.run_until_complete(gh.__aexit__(None, None, None))
+        loop.close()
+
+
+class IncrementalIssueSync:
+    """Issue sync that resumes each repository from the newest ``updatedAt`` stored.
+
+    The first run reads every open issue. Later runs read every issue updated
+    since the mark, open or closed, so an issue that was closed gets its new
+    state upserted over the stored row. Pages come oldest update first, which
+    lets the mark advance to the newest issue seen even when a run stops early.
+
+    Pass the rows that were stored to ``confirm``; ``commit()`` then moves
+    each repository's mark to the last stored ``updatedAt`` before its first
+    failed row, so a failure only holds back its own repository.
+    """
+
+    def __init__(self, repos: Sequence[str] = GITHUB_REPOS, marks: Optional[HighWaterMarks] = None,
+                 max_pages: int = GITHUB_MAX_PAGES):
+        self.repos = list(repos)
+        self.marks = marks or HighWaterMarks()
+        self.max_pages = max_pages
+        self.mark = {repo: self.marks.get(self.source(repo)) for repo in self.repos}
+        # (id, updatedAt) of every yielded row per repository, in page order.
+        self.yielded: Dict[str, List[Tuple[str, Optional[str]]]] = {repo: [] for repo in self.repos}
+        self.stored: Set[str] = set()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def source(repo: str) -> str:
+        return f'github_issues:{repo}'
+
+    def batches(self) -> Iterator[List[Dict]]:
+        for repo, rows in iter_github_issue_batches(self.mark, self.max_pages):
+            self.yielded[repo].extend((str(row['id']), row.get('updated_at')) for row in rows)
+            yield rows
+
+    def confirm(self, rows: Iterable[Dict]) -> None:
+        """Record yielded ``rows`` as stored; may be called from writer threads."""
+        with self._lock:
+            self.stored.update(str(row['id']) for row in rows)
+
+    def commit(self) -> None:
+        """Advance each mark over its stored rows; ``since`` is inclusive, so ties are refetched."""
+        with self._lock:
+            stored = set(self.stored)
+        for repo, rows in self.yielded.items():
+            newest = self.mark[repo]
+            for row_id, updated in rows:
+                if row_id not in stored:
+                    LOG.warning('Issue %s of %s was not stored; its mark stays at %s', row_id, repo, newest)
+                    break
+                # GitHub timestamps are UTC ISO 8601 strings and compare as text.
+                if updated and (newest is None or updated > newest):
+                    newest = updated
+            if newest and newest != self.mark[repo]:
+                self.marks.set(self.source(repo), newest)
+
+
+def update_github_issues() -> List[Dict]:
+    out = []
+    for _, batch in iter_github_issue_batches({repo: None for repo in GITHUB_REPOS}):
+        out.extend(batch)
     return out
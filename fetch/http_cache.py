@@ -0,0 +1,87 @@
+"""On-disk HTTP validator cache for conditional GETs.
+
+The ``ETag`` and ``Last-Modified`` of every page we stored are remembered, so
+the next request can send ``If-None-Match`` / ``If-Modified-Since`` and a
+``304 Not Modified`` lets the caller skip parsing and upserting the page.
+
+Validators should only be stored once the page's data has been handed to
+storage; otherwise a failed push would be hidden behind a 304 forever.
+"""
+import logging
+import os
+import threading
+import time
+from typing import Dict, Iterable, Mapping, Optional, Tuple
+
+from utils.state import connect
+
+LOG = logging.getLogger(__name__)
+
+HTTP_CACHE_ENABLED = os.getenv('HTTP_CACHE_ENABLED', '1') not in ('0', 'false', 'False')
+
+
+class ValidatorCache:
+    def __init__(self, name: str = 'http_validators.db'):
+        self._lock = threading.Lock()
+        self.conn = connect(name)
+        self.conn.execute(
+            'create table if not exists validators ('
+            ' url text primary key,'
+            ' etag text,'
+            ' last_modified text,'
+            ' stored_at real not null)'
+        )
+        self.conn.commit()
+
+    def headers_for(self, url: str) -> Dict[str, str]:
+        """Conditional request headers for ``url`` (empty if nothing is cached)."""
+        with self._lock:
+            row = self.conn.execute('select etag, last_modified from validators where url = ?', (url,)).fetchone()
+        headers = {}
+        if row and row[0]:
+            headers['If-None-Match'] = row[0]
+        if row and row[1]:
+            headers['If-Modified-Since'] = row[1]
+        return headers
+
+    def store(self, url: str, headers: Mapping[str, str]) -> None:
+        self.store_many([(url, headers)])
+
+    def store_many(self, items: Iterable[Tuple[str, Mapping[str, str]]]) -> None:
+        rows = []
+        now = time.time()
+        for url, headers in items:
+            etag, last_modified = _validators(headers)
+            if etag or last_modified:
+                rows.append((url, etag, last_modified, now))
+        if not rows:
+            return
+        with self._lock, self.conn:
+            self.conn.executemany(
+                'insert or replace into validators (url, etag, last_modified, stored_at) values (?, ?, ?, ?)',
+                rows,
+            )
+
+    def forget(self, url: str) -> None:
+        with self._lock, self.conn:
+            self.conn.execute('delete from validators where url = ?', (url,))
+
+
+def _validators(headers: Mapping[str, str]) -> Tuple[Optional[str], Optional[str]]:
+    lowered = {k.lower(): v for k, v in headers.items()}
+    return lowered.get('etag'), lowered.get('last-modified')
+
+
+_cache: Optional[ValidatorCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_validator_cache() -> Optional[ValidatorCache]:
+    """Process-wide validator cache, or ``None`` when HTTP_CACHE_ENABLED is off."""
+    global _cache
+    if not HTTP_CACHE_ENABLED:
+        return None
+    with _cache_lock:
+        if _cache is None:
+            _cache = ValidatorCache()
+        return _cache
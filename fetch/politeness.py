@@ -0,0 +1,267 @@
+"""Per-host politeness scheduler shared by every fetcher.
+
+Each host gets a token bucket that caps its request rate. Responses with a
+status in ``RETRY_STATUSES`` and errors in ``RETRY_ERRORS`` are retried with
+jittered exponential backoff; any other exception propagates at once. A
+``Retry-After`` header is honored and pauses the whole host, not just the
+request that received it. Per-host counters are kept for logging.
+
+The scheduler does not own an HTTP client: callers hand it a zero-argument
+``send`` callable, so it works with sync and async code.
+"""
+import asyncio
+import email.utils
+import logging
+import os
+import random
+import threading
+import time
+from collections import defaultdict
+from dataclasses import asdict, dataclass
+from typing import Awaitable, Callable, Dict, Optional, TypeVar
+from urllib.parse import urlsplit
+
+import httpx
+
+LOG = logging.getLogger(__name__)
+
+HOST_RATE_LIMIT = float(os.getenv('HOST_RATE_LIMIT', '8'))  # requests/sec per host, 0 = unlimited
+HOST_BURST = int(os.getenv('HOST_BURST', '16'))
+# Per-host overrides, e.g. "pub.dev=4,api.github.com=1.5"
+HOST_RATE_LIMITS = os.getenv('HOST_RATE_LIMITS', '')
+FETCH_MAX_RETRIES = int(os.getenv('FETCH_MAX_RETRIES', '4'))
+BACKOFF_BASE = float(os.getenv('BACKOFF_BASE', '0.5'))
+BACKOFF_MAX = float(os.getenv('BACKOFF_MAX', '60'))
+RETRY_AFTER_MAX = float(os.getenv('RETRY_AFTER_MAX', '300'))
+
+RETRY_STATUSES = frozenset((429, 500, 502, 503, 504))
+# Connect failures, timeouts and dropped connections.
+RETRY_ERRORS = (httpx.TransportError,)
+
+R = TypeVar('R')
+
+
+def _parse_rates(spec: str) -> Dict[str, float]:
+    rates = {}
+    for item in spec.split(','):
+        host, _, rate = item.partition('=')
+        if host.strip() and rate.strip():
+            try:
+                rates[host.strip()] = float(rate)
+            except ValueError:
+                LOG.warning('Ignoring invalid HOST_RATE_LIMITS entry %r', item)
+    return rates
+
+
+def host_of(url: str) -> str:
+    return urlsplit(url).hostname or url
+
+
+def retry_after_seconds(headers) -> Optional[float]:
+    """Delay requested by a ``Retry-After`` header (seconds or HTTP date), if any."""
+    value = headers.get('Retry-After') if headers is not None else None
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        when = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, when.timestamp() - time.time())
+
+
+class TokenBucket:
+    """Thread-safe token bucket handing out reservations.
+
+    ``reserve`` always takes a token and returns how long the caller has to
+    wait before using it, which works the same for threads and coroutines.
+    """
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.capacity = max(1, burst)
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def reserve(self) -> float:
+        if self.rate <= 0:
+            return 0.0
+        with self._lock:
+            self._refill(time.monotonic())
+            self.tokens -= 1
+            return 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+
+    def pause(self, seconds: float) -> None:
+        """Make the next reservation wait at least ``seconds``."""
+        if self.rate <= 0:
+            return
+        with self._lock:
+            self._refill(time.monotonic())
+            self.tokens = min(self.tokens, -seconds * self.rate)
+
+
+@dataclass
+class HostStats:
+    requests: int = 0
+    retries: int = 0
+    throttled: int = 0
+    server_errors: int = 0
+    transport_errors: int = 0
+    failures: int = 0
+    wait_sec: float = 0.0
+
+
+class RequestScheduler:
+    def __init__(self, rate: float = HOST_RATE_LIMIT, burst: int = HOST_BURST,
+                 host_rates: Optional[Dict[str, float]] = None, max_retries: int = FETCH_MAX_RETRIES,
+                 backoff_base: float = BACKOFF_BASE, backoff_max: float = BACKOFF_MAX):
+        self.rate = rate
+        self.burst = burst
+        self.host_rates = dict(host_rates if host_rates is not None else _parse_rates(HOST_RATE_LIMITS))
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self._buckets: Dict[str, TokenBucket] = {}
+        self._stats: Dict[str, HostStats] = defaultdict(HostStats)
+        self._lock = threading.Lock()
+
+    def bucket(self, host: str) -> TokenBucket:
+        with self._lock:
+            if host not in self._buckets:
+                self._buckets[host] = TokenBucket(self.host_rates.get(host, self.rate), self.burst)
+            return self._buckets[host]
+
+    def backoff(self, attempt: int) -> float:
+        """Full-jitter exponential backoff for retry number ``attempt`` (0-based)."""
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+
+    def acquire(self, host: str) -> None:
+        """Block until ``host`` may receive another request."""
+        delay = self.bucket(host).reserve()
+        self._count(host, requests=1, wait_sec=delay)
+        if delay:
+            time.sleep(delay)
+
+    async def aacquire(self, host: str) -> None:
+        delay = self.bucket(host).reserve()
+        self._count(host, requests=1, wait_sec=delay)
+        if delay:
+            await asyncio.sleep(delay)
+
+    def run(self, url: str, send: Callable[[], R]) -> R:
+        """Call ``send()`` (which performs one request to ``url``) politely, with retries.
+
+        Returns the last response; a transport error is re-raised once the
+        retries are exhausted, and any other exception right away.
+        """
+        host = host_of(url)
+        attempt = 0
+        while True:
+            self.acquire(host)
+            try:
+                response = send()
+            except RETRY_ERRORS as e:
+                delay = self._on_error(host, url, attempt, e)
+            else:
+                delay = self._on_response(host, url, attempt, response)
+                if delay is None:
+                    return response
+            if delay < 0:
+                return response
+            if delay:
+                time.sleep(delay)
+            attempt += 1
+
+    async def arun(self, url: str, send: Callable[[], Awaitable[R]]) -> R:
+        """Async twin of ``run``."""
+        host = host_of(url)
+        attempt = 0
+        while True:
+            await self.aacquire(host)
+            try:
+                response = await send()
+            except RETRY_ERRORS as e:
+                delay = self._on_error(host, url, attempt, e)
+            else:
+                delay = self._on_response(host, url, attempt, response)
+                if delay is None:
+                    return response
+            if delay < 0:
+                return response
+            if delay:
+                await asyncio.sleep(delay)
+            attempt += 1
+
+    def _on_response(self, host: str, url: str, attempt: int, response) -> Optional[float]:
+        """``None`` to return the response, ``-1`` to give up and return it, else a delay."""
+        status = getattr(response, 'status_code', 0)
+        if status not in RETRY_STATUSES:
+            return None
+        self._count(host, throttled=int(status == 429), server_errors=int(status >= 500))
+        if attempt >= self.max_retries:
+            self._count(host, failures=1)
+            LOG.warning('Giving up on %s after %d retries (HTTP %s)', url, attempt, status)
+            return -1
+        self._count(host, retries=1)
+        retry_after = retry_after_seconds(getattr(response, 'headers', None))
+        if retry_after is not None:
+            # The server asked the whole host to slow down: pause its bucket,
+            # and the retry waits for it in acquire() like everyone else.
+            retry_after = min(retry_after, RETRY_AFTER_MAX)
+            LOG.info('HTTP %s from %s; pausing %s for %.1fs (Retry-After)', status, url, host, retry_after)
+            bucket = self.bucket(host)
+            if bucket.rate <= 0:
+                return retry_after
+            bucket.pause(retry_after)
+            return 0.0
+        delay = self.backoff(attempt)
+        LOG.info('HTTP %s from %s; retry %d in %.1fs', status, url, attempt + 1, delay)
+        return delay
+
+    def _on_error(self, host: str, url: str, attempt: int, error: Exception) -> float:
+        self._count(host, transport_errors=1)
+        if attempt >= self.max_retries:
+            self._count(host, failures=1)
+            raise error
+        delay = self.backoff(attempt)
+        self._count(host, retries=1)
+        LOG.info('%s for %s; retry %d in %.1fs', type(error).__name__, url, attempt + 1, delay)
+        return delay
+
+    def _count(self, host: str, **deltas) -> None:
+        with self._lock:
+            stats = self._stats[host]
+            for name, value in deltas.items():
+                setattr(stats, name, getattr(stats, name) + value)
+
+    def stats(self) -> Dict[str, Dict]:
+        """Per-host counters: requests, retries, throttled, errors, time spent waiting."""
+        with self._lock:
+            return {host: asdict(stats) for host, stats in self._stats.items()}
+
+    def log_stats(self) -> None:
+        for host, s in sorted(self.stats().items()):
+            LOG.info('%s: %d requests, %d retries, %d throttled, %d server errors, '
+                     '%d transport errors, %d failed, %.1fs waiting', host, s['requests'],
+                     s['retries'], s['throttled'], s['server_errors'], s['transport_errors'],
+                     s['failures'], s['wait_sec'])
+
+
+_scheduler: Optional[RequestScheduler] = None
+_scheduler_lock = threading.Lock()
+
+
+def get_scheduler() -> RequestScheduler:
+    """The process-wide scheduler every fetcher goes through."""
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = RequestScheduler()
+        return _scheduler
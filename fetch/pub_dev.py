@@ -1,33 +1,246 @@
-"""Fetch top packages from pub.dev via its API."""
-from typing import List, Dict
-import requests
+"""Fetch Flutter packages from pub.dev via its search API.
+
+Search result pages are fetched concurrently a window at a time and streamed
+out in batches, so memory stays flat however many packages there are.
+``IncrementalPubSync`` pages newest-first and stops at the previous run's
+high-water mark, so a steady-state run touches only a few pages.
+"""
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Generator, Iterable, Iterator, List, Optional, Set
+from urllib.parse import urlencode
+import asyncio
+import json
 import logging
+import os
+import threading
+
+from fetch.engine import AsyncFetcher
+from fetch.http_cache import get_validator_cache
+from fetch.pub_enrich import enrich_packages
+from utils.state import HighWaterMarks
 
 LOG = logging.getLogger(__name__)
 
-PUB_API_SEARCH = "https://pub.dev/api/search?q=flutter&page=1"
+PUB_API_SEARCH = "https://pub.dev/api/search"
+# sdk:flutter matches every package that supports Flutter.
+PUB_SEARCH_QUERY = os.getenv('PUB_SEARCH_QUERY', 'sdk:flutter')
+PUB_PAGE_CONCURRENCY = int(os.getenv('PUB_PAGE_CONCURRENCY', '4'))
+PUB_BATCH_SIZE = int(os.getenv('PUB_BATCH_SIZE', '500'))
+PUB_MAX_PAGES = int(os.getenv('PUB_MAX_PAGES', '0'))  # 0 = every page
+# Re-read this much before the mark, for packages the search index picks up late.
+PUB_SYNC_OVERLAP_MINUTES = int(os.getenv('PUB_SYNC_OVERLAP_MINUTES', '60'))
+# Likes and scores move without a new version; walk the whole catalogue this often.
+PUB_FULL_SYNC_HOURS = int(os.getenv('PUB_FULL_SYNC_HOURS', '168'))  # 0 = only the first run
+
+
+def search_url(page: int, query: str = PUB_SEARCH_QUERY, sort: Optional[str] = None) -> str:
+    params = {'q': query, 'page': page}
+    if sort:
+        params['sort'] = sort
+    return f"{PUB_API_SEARCH}?{urlencode(params)}"
+
+
+def package_row(hit: Dict) -> Optional[Dict]:
+    package_name = hit.get('package', '') if isinstance(hit, dict) else ''
+    if not package_name:
+        return None
+    return {
+        'id': package_name,
+        'name': package_name,
+        'description': hit.get('description', ''),
+        'raw': hit,
+    }
+
+
+def iter_pubdev_batches(batch_size: int = PUB_BATCH_SIZE, max_pages: int = PUB_MAX_PAGES,
+                        concurrency: int = PUB_PAGE_CONCURRENCY, query: str = PUB_SEARCH_QUERY,
+                        sort: Optional[str] = None, conditional: bool = True
+                        ) -> Generator[List[Dict], None, bool]:
+    """Page through the search API, yielding package rows in batches.
+
+    ``concurrency`` result pages are requested at once. Paging stops at the
+    first page without results or without a ``next`` link. Pages answering
+    304 Not Modified are skipped; their validators are stored only after the
+    rows of their window have been consumed.
+
+    The generator returns True when it reached the last page, False when it
+    stopped early on an error or at ``max_pages``.
+    """
+    validators = get_validator_cache() if conditional else None
+    loop = asyncio.new_event_loop()
+    fetcher = AsyncFetcher(concurrency=concurrency, validators=validators)
+    loop.run_until_complete(fetcher.__aenter__())
+    page, total, unchanged, exhausted = 1, 0, 0, False
+    try:
+        while True:
+            last = page + concurrency - 1
+            if max_pages:
+                last = min(last, max_pages)
+            if last < page:
+                break
+            urls = [search_url(n, query, sort) for n in range(page, last + 1)]
+            results = loop.run_until_complete(fetcher.fetch_many(urls))
+            rows, seen, fetched, done = [], set(), [], False
+            for res in results:
+                if res.not_modified:
+                    unchanged += 1
+                    continue
+                if not res.ok:
+                    LOG.warning("Failed to fetch %s: %s", res.url, res.error or f"HTTP {res.status}")
+                    done = True
+                    break
+                try:
+                    data = json.loads(res.text)
+                except ValueError as e:
+                    LOG.warning("Invalid JSON from %s: %s", res.url, e)
+                    done = True
+                    break
+                # pub.dev search API returns package metadata in 'packages'
+                packages = data.get('packages', [])
+                for hit in packages:
+                    row = package_row(hit)
+                    # Rankings can shift while paging; skip repeats within a window.
+                    if row and row['id'] not in seen:
+                        seen.add(row['id'])
+                        rows.append(row)
+                fetched.append(res)
+                if not packages or not data.get('next'):
+                    done = exhausted = True
+                    break
+            total += len(rows)
+            for i in range(0, len(rows), batch_size):
+                yield rows[i:i + batch_size]
+            if validators is not None:
+                validators.store_many((res.url, res.headers) for res in fetched)
+            if done:
+                break
+            page = last + 1
+    finally:
+        loop.run_until_complete(fetcher.__aexit__(None, None, None))
+        loop.close()
+        LOG.info("Found %d packages from pub.dev (%d unchanged pages)", total, unchanged)
+    return exhausted
+
+
+def parse_time(value: Optional[str]) -> Optional[datetime]:
+    if not value:
+        return None
+    try:
+        parsed = datetime.fromisoformat(value)
+    except ValueError:
+        return None
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+
+
+class IncrementalPubSync:
+    """Newest-first pub.dev sync that stops at the previous run's high-water mark.
+
+    Results are paged with ``sort=updated`` and enriched with each package's
+    latest publish time. Once a batch reaches packages published before the
+    mark (less the overlap), everything after it is older still and paging
+    stops. The first run, and one every ``full_sync_hours``, walks the whole
+    catalogue instead.
+
+    Pass the rows that were stored to ``confirm``; ``commit()`` then moves the
+    mark. A package whose row failed holds the mark at its publish time, so
+    the next run reads it again; one that fails on that retry too is logged
+    and skipped rather than holding the mark back on every run.
+    """
+
+    SOURCE = 'pub_packages'
+    FULL_SOURCE = 'pub_packages:full_sync'
+    FAILED_SOURCE = 'pub_packages:failed'
+
+    def __init__(self, marks: Optional[HighWaterMarks] = None, query: str = PUB_SEARCH_QUERY,
+                 max_pages: int = PUB_MAX_PAGES, overlap_minutes: int = PUB_SYNC_OVERLAP_MINUTES,
+                 full_sync_hours: int = PUB_FULL_SYNC_HOURS):
+        self.marks = marks or HighWaterMarks()
+        self.query = query
+        self.max_pages = max_pages
+        self.overlap = timedelta(minutes=overlap_minutes)
+        self.mark = parse_time(self.marks.get(self.SOURCE))
+        last_full = parse_time(self.marks.get(self.FULL_SOURCE))
+        self.full = self.mark is None or (
+            full_sync_hours > 0 and (last_full is None or
+                                     datetime.now(timezone.utc) - last_full > timedelta(hours=full_sync_hours))
+        )
+        self.newest = self.mark
+        self.complete = False
+        # Publish time of every yielded package, and the names confirmed stored.
+        self.yielded: Dict[str, Optional[datetime]] = {}
+        self.stored: Set[str] = set()
+        self._lock = threading.Lock()
+
+    def confirm(self, rows: Iterable[Dict]) -> None:
+        """Record yielded ``rows`` as stored; may be called from writer threads."""
+        with self._lock:
+            self.stored.update(str(row['id']) for row in rows)
+
+    def batches(self) -> Iterator[List[Dict]]:
+        """Yield enriched ``pub_packages`` rows, newest first."""
+        stop_at = None if self.full else self.mark - self.overlap
+        LOG.info("pub.dev %s sync%s", "full" if self.full else "incremental",
+                 f" down to {stop_at.isoformat()}" if stop_at else "")
+        # Newest-first pages shift with every publish, so validators would never match.
+        pages = iter_pubdev_batches(max_pages=self.max_pages, query=self.query, sort='updated',
+                                    conditional=False)
+        try:
+            while True:
+                try:
+                    rows = next(pages)
+                except StopIteration as stop:
+                    self.complete = bool(stop.value)
+                    return
+                # Likes and scores change without a release; the full sync refetches them.
+                rows = enrich_packages(rows, refresh=self.full)
+                published = {str(row['id']): parse_time(row.get('published_at')) for row in rows}
+                self.yielded.update(published)
+                times = [t for t in published.values() if t]
+                if times:
+                    self.newest = max([self.newest] + times if self.newest else times)
+                yield rows
+                if stop_at and any(t < stop_at for t in times):
+                    LOG.info("Reached the pub.dev high-water mark %s", self.mark.isoformat())
+                    self.complete = True
+                    return
+        finally:
+            pages.close()
+
+    def commit(self) -> None:
+        """Advance the high-water mark over the confirmed rows; call once every write has finished."""
+        if not self.complete:
+            LOG.warning("pub.dev sync stopped early; keeping the high-water mark at %s",
+                        self.mark.isoformat() if self.mark else None)
+            return
+        with self._lock:
+            failed = {name: t for name, t in self.yielded.items() if name not in self.stored}
+        failed_before = set(json.loads(self.marks.get(self.FAILED_SOURCE) or '[]'))
+        retry = {name: t for name, t in failed.items() if name not in failed_before}
+        skipped = sorted(set(failed) - set(retry))
+        if skipped:
+            LOG.warning("Skipping %d pub.dev packages that failed to store again: %s",
+                        len(skipped), ', '.join(skipped[:20]))
+        newest = self.newest
+        if retry:
+            LOG.warning("%d pub.dev packages failed to store; the next run retries them: %s",
+                        len(retry), ', '.join(sorted(retry)[:20]))
+            times = [t for t in retry.values() if t]
+            if newest and times:
+                newest = min(newest, min(times))
+            if self.mark and newest:
+                newest = max(newest, self.mark)
+        if newest:
+            self.marks.set(self.SOURCE, newest.isoformat())
+        self.marks.set(self.FAILED_SOURCE, json.dumps(sorted(failed)))
+        if self.full:
+            self.marks.set(self.FULL_SOURCE, datetime.now(timezone.utc).isoformat())
+
 
-def update_pubdev() -> List[Dict]:
+def update_pubdev(max_pages: int = PUB_MAX_PAGES) -> List[Dict]:
     out = []
     try:
-        r = requests.get(PUB_API_SEARCH, timeout=15)
-        r.raise_for_status()
-        data = r.json()
-        
-        # pub.dev search API returns package metadata in 'packages'
-        packages = data.get('packages', [])
-        LOG.info(f"Found {len(packages)} packages from pub.dev")
-        
-        for p in packages[:50]:  # Limit to top 50
-            if isinstance(p, dict):
-                package_name = p.get('package', '')
-                if package_name:
-                    out.append({
-                        'id': package_name,
-                        'name': package_name,
-                        'description': p.get('description', ''),
-                        'raw': p,
-                    })
+        for batch in iter_pubdev_batches(max_pages=max_pages):
+            out.extend(batch)
     except Exception as e:
         LOG.exception('Error fetching pub.dev: %s', e)
     return out
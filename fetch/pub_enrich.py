@@ -0,0 +1,175 @@
+"""Enrich pub.dev search hits with package metadata and scores.
+
+For every package the ``/api/packages/<name>`` document (latest version,
+publish time, description) is requested conditionally; only when its latest
+version differs from the cached one is ``/api/packages/<name>/score`` fetched
+again (likes, popularity, pub points). Results are cached on disk, so a
+package whose version did not move costs one (usually 304) request.
+
+Likes and scores also move between releases; ``refresh=True`` refetches the
+score of every package, which the periodic full pub.dev sync does.
+"""
+import asyncio
+import json
+import logging
+import os
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+from urllib.parse import quote
+
+from fetch.engine import AsyncFetcher, FetchResult
+from fetch.http_cache import get_validator_cache
+from utils.state import connect
+
+LOG = logging.getLogger(__name__)
+
+PUB_API_PACKAGE = "https://pub.dev/api/packages/{name}"
+PUB_API_SCORE = "https://pub.dev/api/packages/{name}/score"
+PUB_ENRICH_CONCURRENCY = int(os.getenv('PUB_ENRICH_CONCURRENCY', '16'))
+
+# Columns of pub_packages filled in by enrichment.
+ENRICHED_FIELDS = ('latest_version', 'published_at', 'likes', 'popularity', 'points', 'max_points')
+
+
+class EnrichmentCache:
+    def __init__(self, name: str = 'pub_enrichment.db'):
+        self._lock = threading.Lock()
+        self.conn = connect(name)
+        self.conn.execute(
+            'create table if not exists packages ('
+            ' name text primary key,'
+            ' version text,'
+            ' data text not null,'
+            ' fetched_at real not null)'
+        )
+        self.conn.commit()
+
+    def get_many(self, names: List[str]) -> Dict[str, Tuple[str, Dict]]:
+        found = {}
+        with self._lock:
+            for i in range(0, len(names), 500):
+                chunk = names[i:i + 500]
+                marks = ','.join('?' * len(chunk))
+                cur = self.conn.execute(f'select name, version, data from packages where name in ({marks})', chunk)
+                for name, version, data in cur.fetchall():
+                    found[name] = (version, json.loads(data))
+        return found
+
+    def put_many(self, items: Iterable[Tuple[str, str, Dict]]) -> None:
+        now = time.time()
+        with self._lock, self.conn:
+            self.conn.executemany(
+                'insert or replace into packages (name, version, data, fetched_at) values (?, ?, ?, ?)',
+                [(name, version, json.dumps(data), now) for name, version, data in items],
+            )
+
+
+def parse_package_info(data: Dict) -> Dict:
+    latest = data.get('latest') or {}
+    pubspec = latest.get('pubspec') or {}
+    return {
+        'latest_version': latest.get('version'),
+        'published_at': latest.get('published'),
+        'description': pubspec.get('description') or '',
+    }
+
+
+def parse_score(data: Dict) -> Dict:
+    return {
+        'likes': data.get('likeCount'),
+        'popularity': data.get('popularityScore'),
+        'points': data.get('grantedPoints'),
+        'max_points': data.get('maxPoints'),
+    }
+
+
+def _json(res: FetchResult) -> Optional[Dict]:
+    if not res.ok:
+        if not res.not_modified:
+            LOG.warning("Failed to fetch %s: %s", res.url, res.error or f"HTTP {res.status}")
+        return None
+    try:
+        return json.loads(res.text)
+    except ValueError:
+        LOG.warning("Invalid JSON from %s", res.url)
+        return None
+
+
+async def _fetch_enrichment(names: List[str], cached: Dict[str, Tuple[str, Dict]], concurrency: int,
+                            refresh: bool = False
+                            ) -> Tuple[Dict[str, Dict], List[Tuple[str, str, Dict]], List[Tuple[str, Dict]]]:
+    """Return ``(enrichment by name, fresh cache entries, validators to store)``."""
+    out: Dict[str, Dict] = {}
+    stale: Dict[str, Dict] = {}
+    info_headers: Dict[str, Dict] = {}
+    async with AsyncFetcher(concurrency=concurrency, validators=get_validator_cache()) as fetcher:
+        # Conditional only when the cached data can stand in for a 304.
+        infos = await asyncio.gather(*(
+            fetcher.fetch(PUB_API_PACKAGE.format(name=quote(name)), conditional=name in cached)
+            for name in names
+        ))
+        for name, res in zip(names, infos):
+            if res.not_modified:
+                if refresh:
+                    stale[name] = cached[name][1]
+                else:
+                    out[name] = cached[name][1]
+                continue
+            data = _json(res)
+            if data is None:
+                continue
+            info = parse_package_info(data)
+            info_headers[name] = res.headers
+            if not refresh and name in cached and cached[name][0] == info['latest_version']:
+                out[name] = {**cached[name][1], **info}
+            else:
+                stale[name] = info
+
+        scores = await asyncio.gather(*(
+            fetcher.fetch(PUB_API_SCORE.format(name=quote(name)), conditional=False) for name in stale
+        ))
+        fresh = []
+        for (name, info), res in zip(stale.items(), scores):
+            score = _json(res)
+            if score is None:
+                # Keep serving the old score of a package whose version did not move.
+                if name in cached and cached[name][0] == info['latest_version']:
+                    out[name] = {**cached[name][1], **info}
+                continue
+            out[name] = {**info, **parse_score(score)}
+            fresh.append((name, info['latest_version'], out[name]))
+
+    # A validator is only worth keeping once the package is fully cached.
+    validated = [
+        (PUB_API_PACKAGE.format(name=quote(name)), headers)
+        for name, headers in info_headers.items() if name in out
+    ]
+    return out, fresh, validated
+
+
+def enrich_packages(rows: List[Dict], concurrency: int = PUB_ENRICH_CONCURRENCY,
+                    cache: Optional[EnrichmentCache] = None, refresh: bool = False) -> List[Dict]:
+    """Add metadata and score fields to ``pub_packages`` rows (in place) and return them.
+
+    ``refresh`` refetches scores even for packages whose version is cached.
+    Rows whose package could not be enriched are returned unchanged.
+    """
+    if not rows:
+        return rows
+    cache = cache or EnrichmentCache()
+    names = [row['name'] for row in rows]
+    enriched, fresh, validated = asyncio.run(_fetch_enrichment(names, cache.get_many(names), concurrency, refresh))
+    cache.put_many(fresh)
+    validators = get_validator_cache()
+    if validators is not None:
+        validators.store_many(validated)
+    for row in rows:
+        data = enriched.get(row['name'])
+        if data:
+            row.update({k: data.get(k) for k in ENRICHED_FIELDS})
+            if data.get('description'):
+                row['description'] = data['description']
+    LOG.info("Enriched %d/%d pub.dev packages (%d %s)", len(enriched), len(rows), len(fresh),
+             "scores refreshed" if refresh else "with a new version")
+    return rows
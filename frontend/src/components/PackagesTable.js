@@ -36,12 +36,12 @@ function PackagesTable() {
     return new Date(dateString).toLocaleDateString();
   };
 
+  // Scores are top-level columns; list rows no longer carry `raw`.
   const getPackageStats = (pkg) => {
-    const raw = pkg.raw || {};
     return {
-      likes: raw.likes || 0,
-      popularity: raw.popularity || 0,
-      pubPoints: raw.pubPoints || 0,
+      likes: pkg.likes || 0,
+      popularity: pkg.popularity || 0,
+      pubPoints: pkg.points || 0,
     };
   };
 
@@ -15,6 +15,11 @@ const apiClient = axios.create({
   },
 });
 
+// List and search endpoints return compact rows unless `fields` names more;
+// ask for the long text the tables show.
+const ISSUE_FIELDS = 'title,url,issue_number,state,labels,created_at,updated_at,body';
+const SEARCH_FIELDS = 'title,url,summary,updated_at,name,description,issue_number,state,labels,created_at,body';
+
 // Request interceptor for logging
 apiClient.interceptors.request.use(
   (config) => {
@@ -360,7 +365,7 @@ export function DataProvider({ children }) {
     dispatch({ type: 'SET_LOADING', payload: { type: 'issues', loading: true } });
     try {
       const response = await apiClient.get('/api/flutter/issues', {
-        params: { limit, labels, offset }
+        params: { limit, labels, offset, fields: ISSUE_FIELDS }
       });
       
       if (offset === 0) {
@@ -385,7 +390,7 @@ export function DataProvider({ children }) {
     dispatch({ type: 'SET_LOADING', payload: { type: 'search', loading: true } });
     try {
       const response = await apiClient.get('/api/flutter/search', {
-        params: { q: query.trim(), limit }
+        params: { q: query.trim(), limit, fields: SEARCH_FIELDS }
       });
       dispatch({ type: 'SET_SEARCH_RESULTS', payload: response.data });
       dispatch({ type: 'CLEAR_ERROR' });
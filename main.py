@@ -1,31 +1,151 @@
 import os
 import logging
+import threading
+from collections import Counter, defaultdict
+from datetime import datetime, timezone
+from typing import Callable, Dict, List, Optional, Set, Tuple
 from apscheduler.schedulers.background import BackgroundScheduler
-from fetch.flutter_docs import update_flutter_docs
-from fetch.pub_dev import update_pubdev
-from fetch.github_issues import update_github_issues
-from storage.supabase_client import push_to_supabase
+from fetch.flutter_docs import docs_crawler, iter_doc_batches
+from fetch.pub_dev import IncrementalPubSync
+from fetch.github_comments import IssueCommentSync
+from fetch.github_issues import IncrementalIssueSync
+from fetch.github_budget import get_github_budget
+from fetch.politeness import get_scheduler
+from storage.backend import get_storage
+from storage.write_behind import WriteBehind
+from utils.fingerprint import Diff, FingerprintStore
+from utils.transport import get_transport
 from dotenv import load_dotenv
 
 load_dotenv()
 LOG = logging.getLogger("sync")
 logging.basicConfig(level=logging.INFO)
+logging.getLogger("httpx").setLevel(logging.WARNING)
+# Writer threads share the tally.
+TALLY_LOCK = threading.Lock()
+# Tables whose sizes the API serves from sync_stats.
+STATS_TABLES = ("flutter_docs", "flutter_doc_chunks", "pub_packages", "github_issues", "github_issue_comments")
+
+def sync_rows(table: str, rows: List[Dict], fingerprints: FingerprintStore, tally: Dict[str, Counter],
+              confirm: Optional[Callable[[List[Dict]], None]] = None) -> Tuple[Diff, Set[str]]:
+    """Push only the new or changed ``rows`` and remember what was written.
+
+    ``confirm`` is called with the rows now stored (unchanged ones included).
+    Returns the diff and the ids of the rows that could not be written.
+    """
+    if not rows:
+        return Diff(), set()
+    diff = fingerprints.diff(table, rows)
+    with TALLY_LOCK:
+        tally[table] += diff.counts()
+    failed = set()
+    if diff.rows:
+        report = get_storage().upsert(table, diff.rows)
+        fingerprints.commit(table, diff, report.written)
+        failed = {str(row["id"]) for row in diff.rows} - set(report.written)
+        with TALLY_LOCK:
+            tally[table]['failed'] += len(failed)
+    if confirm:
+        confirm([row for row in rows if str(row["id"]) not in failed])
+    return diff, failed
+
+def prune_stale_chunks(docs: Diff, chunks: List[Dict], fingerprints: FingerprintStore):
+    """Drop chunks left over from a longer previous version of each changed doc."""
+    current = {chunk["id"] for chunk in chunks}
+    chunk_counts = Counter(chunk["doc_id"] for chunk in chunks)
+    for doc in docs.changed:
+        stale = [i for i in fingerprints.ids("flutter_doc_chunks", f'{doc["id"]}:') if i not in current]
+        if stale:
+            try:
+                get_storage().delete("flutter_doc_chunks", {"doc_id": doc["id"]},
+                                     gte={"position": chunk_counts[doc["id"]]})
+            except Exception as e:
+                LOG.exception("Error pruning chunks of %s: %s", doc["id"], e)
+                continue
+            fingerprints.forget("flutter_doc_chunks", stale)
+
+def sync_docs(docs: List[Dict], chunks: List[Dict], fingerprints: FingerprintStore, tally: Dict[str, Counter],
+              confirm: Optional[Callable[[List[Dict]], None]] = None):
+    """Store a docs batch; chunks go after their docs, which they reference.
+
+    ``confirm`` is then called with the docs stored along with all their
+    chunks, so the crawler only remembers those pages as done.
+    """
+    diff, failed = sync_rows("flutter_docs", docs, fingerprints, tally)
+    _, failed_chunks = sync_rows("flutter_doc_chunks", chunks, fingerprints, tally)
+    prune_stale_chunks(diff, chunks, fingerprints)
+    if confirm:
+        failed |= {chunk["doc_id"] for chunk in chunks if str(chunk["id"]) in failed_chunks}
+        confirm([doc for doc in docs if str(doc["id"]) not in failed])
+
+def record_stats(tally: Dict[str, Counter]):
+    """Count each table once per run into sync_stats, so /api/flutter/stats never has to."""
+    storage = get_storage()
+    now = datetime.now(timezone.utc).isoformat()
+    rows = []
+    for table in STATS_TABLES:
+        counts = tally.get(table, Counter())
+        try:
+            row_count = storage.count(table)
+        except Exception as e:
+            LOG.exception("Error counting %s: %s", table, e)
+            continue
+        rows.append({"id": table, "row_count": row_count, "new_rows": counts["new"],
+                     "changed_rows": counts["changed"], "failed_rows": counts["failed"], "last_sync_at": now})
+    if rows and storage.upsert("sync_stats", rows).failed:
+        LOG.warning("Could not store sync stats")
 
 def job():
     LOG.info("Starting sync job...")
+    fingerprints = FingerprintStore()
+    tally = defaultdict(Counter)
+    # Batches are stored by writer threads while the next ones are fetched;
+    # each cursor only advances after a flush shows its rows were written.
+    writer = WriteBehind()
     try:
-        docs = update_flutter_docs()
-        pkgs = update_pubdev()
-        issues = update_github_issues()
-        if docs:
-            push_to_supabase("flutter_docs", docs)
-        if pkgs:
-            push_to_supabase("pub_packages", pkgs)
-        if issues:
-            push_to_supabase("github_issues", issues)
+        # Docs are pushed batch by batch so an interrupted crawl resumes
+        # from its frontier without losing pages it already fetched; a page
+        # only counts as crawled once the writer confirms it was stored.
+        crawler = docs_crawler()
+        for docs, chunks in iter_doc_batches(crawler=crawler):
+            writer.submit(sync_docs, docs, chunks, fingerprints, tally, crawler.confirm)
+        pub = IncrementalPubSync()
+        for pkgs in pub.batches():
+            writer.submit(sync_rows, "pub_packages", pkgs, fingerprints, tally, pub.confirm)
+        writer.flush()
+        pub.commit()
+        issues = IncrementalIssueSync()
+        comments = IssueCommentSync()
+
+        def issues_stored(rows: List[Dict]):
+            # Comments are only fetched for issues whose rows they can reference.
+            issues.confirm(rows)
+            comments.note_issues(rows)
+
+        for batch in issues.batches():
+            writer.submit(sync_rows, "github_issues", batch, fingerprints, tally, issues_stored)
+        # Also makes sure issues are stored before their comments.
+        writer.flush()
+        issues.commit()
+        # Comments of issues with new activity, including any left over from
+        # earlier runs that ran short of rate budget.
+        for batch in comments.batches():
+            writer.submit(sync_rows, "github_issue_comments", batch, fingerprints, tally, comments.confirm)
+        writer.flush()
+        comments.commit()
+        record_stats(tally)
+        for table, counts in tally.items():
+            LOG.info("%s: %d new, %d changed, %d unchanged, %d failed", table,
+                     counts['new'], counts['changed'], counts['unchanged'], counts['failed'])
+        writer.log_stats()
+        get_scheduler().log_stats()
+        get_github_budget().log_stats()
+        get_transport().log_stats()
         LOG.info("Sync job completed.")
     except Exception as e:
         LOG.exception("Error during sync: %s", e)
+    finally:
+        writer.close()
 
 if __name__ == '__main__':
     scheduler = BackgroundScheduler()
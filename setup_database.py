@@ -12,54 +12,25 @@ import logging
 logging.basicConfig(level=logging.INFO)
 LOG = logging.getLogger(__name__)
 
+SCHEMA_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'sql', 'init_tables.sql')
+
 def create_tables():
-    """Create the required tables in Supabase"""
+    """Create the required tables in Supabase from sql/init_tables.sql"""
     LOG.info("Setting up database tables...")
     
     if supabase is None:
         LOG.error("❌ Supabase client is None")
         return False
     
-    # SQL commands to create tables
-    sql_commands = [
-        """
-        CREATE TABLE IF NOT EXISTS flutter_docs (
-            id text PRIMARY KEY,
-            title text,
-            url text,
-            summary text,
-            content text,
-            updated_at timestamptz DEFAULT now()
-        );
-        """,
-        """
-        CREATE TABLE IF NOT EXISTS pub_packages (
-            id text PRIMARY KEY,
-            name text,
-            description text,
-            raw jsonb,
-            updated_at timestamptz DEFAULT now()
-        );
-        """,
-        """
-        CREATE TABLE IF NOT EXISTS github_issues (
-            id text PRIMARY KEY,
-            title text,
-            issue_number int,
-            labels text[],
-            body text,
-            url text,
-            created_at timestamptz
-        );
-        """
-    ]
+    # The schema file is the single source of truth: tables, added columns,
+    # search vectors, indexes and the search_*/fuzzy_* functions. Every
+    # statement in it is idempotent, so it also upgrades an existing database.
+    with open(SCHEMA_FILE, encoding='utf-8') as f:
+        sql = f.read()
     
     try:
-        # Execute each SQL command
-        for i, sql in enumerate(sql_commands, 1):
-            LOG.info(f"Executing SQL command {i}...")
-            result = supabase.rpc('exec_sql', {'sql': sql}).execute()
-            LOG.info(f"✅ Command {i} executed successfully")
+        LOG.info(f"Executing {SCHEMA_FILE}...")
+        supabase.rpc('exec_sql', {'sql': sql}).execute()
         
         LOG.info("🎉 All tables created successfully!")
         return True
@@ -68,16 +39,16 @@ def create_tables():
         LOG.error(f"❌ Error creating tables: {e}")
         LOG.info("You may need to run the SQL commands manually in the Supabase SQL Editor:")
         LOG.info("Go to: https://supabase.com/dashboard/project/lthfkjiggwawxdjzzqee/sql")
-        for i, sql in enumerate(sql_commands, 1):
-            LOG.info(f"\n--- SQL Command {i} ---")
-            LOG.info(sql.strip())
+        LOG.info(f"\n--- {SCHEMA_FILE} ---")
+        LOG.info(sql.strip())
         return False
 
 def test_tables():
     """Test that tables exist and are accessible"""
     LOG.info("Testing table access...")
     
-    tables = ['flutter_docs', 'pub_packages', 'github_issues']
+    tables = ['flutter_docs', 'pub_packages', 'github_issues', 'flutter_doc_chunks', 'github_issue_comments',
+              'sync_stats']
     
     for table in tables:
         try:
@@ -26,3 +26,192 @@ create table if not exists github_issues (
   url text,
   created_at timestamptz
 );
+
+-- One row per h2/h3 section of a docs page; `url` points at the section anchor.
+create table if not exists flutter_doc_chunks (
+  id text primary key,
+  doc_id text not null references flutter_docs(id) on delete cascade,
+  position int not null,
+  heading text,
+  anchor text,
+  url text,
+  content text,
+  token_count int,
+  updated_at timestamptz default now()
+);
+
+create index if not exists flutter_doc_chunks_doc_idx on flutter_doc_chunks (doc_id, position);
+
+-- pub.dev metadata and scores filled in by fetch/pub_enrich.py; ranking
+-- happens in the database through these indexes.
+alter table pub_packages add column if not exists latest_version text;
+alter table pub_packages add column if not exists published_at timestamptz;
+alter table pub_packages add column if not exists likes int;
+alter table pub_packages add column if not exists popularity real;
+alter table pub_packages add column if not exists points int;
+alter table pub_packages add column if not exists max_points int;
+
+create index if not exists pub_packages_popularity_id_idx on pub_packages (popularity desc, id desc);
+create index if not exists pub_packages_likes_id_idx on pub_packages (likes desc, id desc);
+create index if not exists pub_packages_points_id_idx on pub_packages (points desc, id desc);
+
+-- Filled in by fetch/github_issues.py (GraphQL).
+alter table github_issues add column if not exists state text;
+alter table github_issues add column if not exists updated_at timestamptz;
+alter table github_issues add column if not exists reactions int;
+
+-- Issues come from every repository in GITHUB_REPOS; rows stored before
+-- that were all flutter/flutter.
+alter table github_issues add column if not exists repo text;
+update github_issues set repo = 'flutter/flutter' where repo is null;
+create index if not exists github_issues_repo_created_id_idx on github_issues (repo, created_at desc, id desc);
+alter table github_issues add column if not exists comment_count int;
+
+-- Issue comments, streamed by fetch/github_comments.py for issues with new activity.
+create table if not exists github_issue_comments (
+  id text primary key,
+  issue_id text not null references github_issues(id) on delete cascade,
+  repo text,
+  author text,
+  body text,
+  url text,
+  reactions int,
+  created_at timestamptz,
+  updated_at timestamptz
+);
+
+create index if not exists github_issue_comments_issue_idx on github_issue_comments (issue_id, created_at);
+
+-- Full-text search. Each searchable table keeps a weighted tsvector (title-like
+-- columns rank above body text) in a generated column with a GIN index, so
+-- a search is an index lookup instead of an ilike scan over the text. List
+-- endpoints filter on it with `search_vector=wfts(english).<query>`; the
+-- search_* functions below return rows ranked by relevance.
+alter table flutter_docs add column if not exists search_vector tsvector generated always as (
+  setweight(to_tsvector('english', coalesce(title, '')), 'A') ||
+  setweight(to_tsvector('english', coalesce(summary, '')), 'B') ||
+  setweight(to_tsvector('english', coalesce(content, '')), 'C')
+) stored;
+create index if not exists flutter_docs_search_idx on flutter_docs using gin (search_vector);
+
+alter table flutter_doc_chunks add column if not exists search_vector tsvector generated always as (
+  setweight(to_tsvector('english', coalesce(heading, '')), 'A') ||
+  setweight(to_tsvector('english', coalesce(content, '')), 'C')
+) stored;
+create index if not exists flutter_doc_chunks_search_idx on flutter_doc_chunks using gin (search_vector);
+
+alter table pub_packages add column if not exists search_vector tsvector generated always as (
+  setweight(to_tsvector('english', coalesce(name, '')), 'A') ||
+  setweight(to_tsvector('english', coalesce(description, '')), 'B')
+) stored;
+create index if not exists pub_packages_search_idx on pub_packages using gin (search_vector);
+
+alter table github_issues add column if not exists search_vector tsvector generated always as (
+  setweight(to_tsvector('english', coalesce(title, '')), 'A') ||
+  setweight(to_tsvector('english', coalesce(body, '')), 'C')
+) stored;
+create index if not exists github_issues_search_idx on github_issues using gin (search_vector);
+
+alter table github_issue_comments add column if not exists search_vector tsvector generated always as (
+  to_tsvector('english', coalesce(body, ''))
+) stored;
+create index if not exists github_issue_comments_search_idx on github_issue_comments using gin (search_vector);
+
+-- search_<table>(q, max_results, filters): rows matching the web-style query
+-- `q`, best first. `filters` is a jsonb object of column values the rows
+-- must contain, e.g. '{"repo": "dart-lang/sdk"}'.
+create or replace function search_flutter_docs(q text, max_results int default 20, filters jsonb default '{}')
+returns setof flutter_docs language sql stable as $$
+  select t.* from flutter_docs t, websearch_to_tsquery('english', q) query
+  where t.search_vector @@ query and (filters = '{}' or to_jsonb(t) @> filters)
+  order by ts_rank_cd(t.search_vector, query) desc, t.id
+  limit max_results;
+$$;
+
+create or replace function search_flutter_doc_chunks(q text, max_results int default 20, filters jsonb default '{}')
+returns setof flutter_doc_chunks language sql stable as $$
+  select t.* from flutter_doc_chunks t, websearch_to_tsquery('english', q) query
+  where t.search_vector @@ query and (filters = '{}' or to_jsonb(t) @> filters)
+  order by ts_rank_cd(t.search_vector, query) desc, t.id
+  limit max_results;
+$$;
+
+create or replace function search_pub_packages(q text, max_results int default 20, filters jsonb default '{}')
+returns setof pub_packages language sql stable as $$
+  select t.* from pub_packages t, websearch_to_tsquery('english', q) query
+  where t.search_vector @@ query and (filters = '{}' or to_jsonb(t) @> filters)
+  order by ts_rank_cd(t.search_vector, query) desc, t.id
+  limit max_results;
+$$;
+
+create or replace function search_github_issues(q text, max_results int default 20, filters jsonb default '{}')
+returns setof github_issues language sql stable as $$
+  select t.* from github_issues t, websearch_to_tsquery('english', q) query
+  where t.search_vector @@ query and (filters = '{}' or to_jsonb(t) @> filters)
+  order by ts_rank_cd(t.search_vector, query) desc, t.id
+  limit max_results;
+$$;
+
+create or replace function search_github_issue_comments(q text, max_results int default 20, filters jsonb default '{}')
+returns setof github_issue_comments language sql stable as $$
+  select t.* from github_issue_comments t, websearch_to_tsquery('english', q) query
+  where t.search_vector @@ query and (filters = '{}' or to_jsonb(t) @> filters)
+  order by ts_rank_cd(t.search_vector, query) desc, t.id
+  limit max_results;
+$$;
+
+-- Typo-tolerant lookups on names and titles (`flutter_blok`, `riverpd`).
+-- Trigram GIN indexes serve `q <% column` (word similarity at least
+-- pg_trgm.word_similarity_threshold, 0.6 by default); the fuzzy_* functions
+-- rank the matches by similarity of the whole strings.
+create extension if not exists pg_trgm;
+
+create index if not exists pub_packages_name_trgm_idx on pub_packages using gin (name gin_trgm_ops);
+create index if not exists flutter_docs_title_trgm_idx on flutter_docs using gin (title gin_trgm_ops);
+create index if not exists github_issues_title_trgm_idx on github_issues using gin (title gin_trgm_ops);
+
+create or replace function fuzzy_pub_packages(q text, max_results int default 20)
+returns setof pub_packages language sql stable as $$
+  select t.* from pub_packages t
+  where q <% t.name
+  order by similarity(q, t.name) desc, word_similarity(q, t.name) desc, t.id
+  limit max_results;
+$$;
+
+create or replace function fuzzy_flutter_docs(q text, max_results int default 20)
+returns setof flutter_docs language sql stable as $$
+  select t.* from flutter_docs t
+  where q <% t.title
+  order by similarity(q, t.title) desc, word_similarity(q, t.title) desc, t.id
+  limit max_results;
+$$;
+
+create or replace function fuzzy_github_issues(q text, max_results int default 20)
+returns setof github_issues language sql stable as $$
+  select t.* from github_issues t
+  where q <% t.title
+  order by similarity(q, t.title) desc, word_similarity(q, t.title) desc, t.id
+  limit max_results;
+$$;
+
+-- Keyset pagination: list endpoints order by (sort column, id) and continue
+-- after the (value, id) of the last row served, so every page is a seek on
+-- one of these indexes (or the score and repo indexes above) however deep
+-- it is.
+create index if not exists flutter_docs_updated_id_idx on flutter_docs (updated_at desc, id desc);
+create index if not exists pub_packages_updated_id_idx on pub_packages (updated_at desc, id desc);
+create index if not exists github_issues_created_id_idx on github_issues (created_at desc, id desc);
+create index if not exists github_issues_state_created_id_idx on github_issues (state, created_at desc, id desc);
+
+-- Written by the sync job after each run: one row per table with its row
+-- count and what the run changed. /api/flutter/stats reads these few rows
+-- instead of counting the tables on every request.
+create table if not exists sync_stats (
+  id text primary key,
+  row_count bigint,
+  new_rows int,
+  changed_rows int,
+  failed_rows int,
+  last_sync_at timestamptz,
+  updated_at timestamptz default now()
+);
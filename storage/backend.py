@@ -0,0 +1,183 @@
+"""Storage interface shared by the sync job and the API.
+
+``get_storage()`` returns the backend named by ``STORAGE_BACKEND``:
+``supabase`` (default) or ``sqlite``, a local file with FTS5 indexes for
+single-node deployments and offline benchmarks. Both speak plain row dicts
+keyed by ``id``.
+"""
+import asyncio
+import logging
+import os
+import threading
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Mapping, Optional, Sequence, Tuple
+
+LOG = logging.getLogger(__name__)
+
+STORAGE_BACKEND = os.getenv('STORAGE_BACKEND', 'supabase')
+
+# Columns matched by free-text search, per table.
+SEARCH_COLUMNS = {
+    'flutter_docs': ('title', 'content'),
+    'flutter_doc_chunks': ('heading', 'content'),
+    'pub_packages': ('name', 'description'),
+    'github_issues': ('title', 'body'),
+    'github_issue_comments': ('body',),
+}
+
+# Short name-like column per table for typo-tolerant lookups (``fuzzy``).
+FUZZY_COLUMNS = {
+    'flutter_docs': 'title',
+    'pub_packages': 'name',
+    'github_issues': 'title',
+}
+
+# Columns returned when a read names none: every stored column except the
+# derived ``search_vector`` (see sql/init_tables.sql).
+COLUMNS = {
+    'flutter_docs': ('id', 'title', 'url', 'summary', 'content', 'updated_at'),
+    'flutter_doc_chunks': ('id', 'doc_id', 'position', 'heading', 'anchor', 'url', 'content',
+                           'token_count', 'updated_at'),
+    'pub_packages': ('id', 'name', 'description', 'raw', 'updated_at', 'latest_version', 'published_at',
+                     'likes', 'popularity', 'points', 'max_points'),
+    'github_issues': ('id', 'title', 'issue_number', 'labels', 'body', 'url', 'created_at', 'state',
+                      'updated_at', 'reactions', 'repo', 'comment_count'),
+    'github_issue_comments': ('id', 'issue_id', 'repo', 'author', 'body', 'url', 'reactions',
+                              'created_at', 'updated_at'),
+    'sync_stats': ('id', 'row_count', 'new_rows', 'changed_rows', 'failed_rows', 'last_sync_at', 'updated_at'),
+}
+
+# What list and search endpoints return unless ``fields`` asks for more:
+# enough to show and link a row, without the long text and raw JSON columns.
+# Chunks keep their content; a section is what they are fetched for.
+SUMMARY_COLUMNS = {
+    'flutter_docs': ('id', 'title', 'url', 'summary', 'updated_at'),
+    'flutter_doc_chunks': ('id', 'doc_id', 'position', 'heading', 'url', 'content', 'token_count'),
+    'pub_packages': ('id', 'name', 'description', 'latest_version', 'published_at', 'likes', 'popularity',
+                     'points', 'max_points', 'updated_at'),
+    'github_issues': ('id', 'title', 'url', 'repo', 'issue_number', 'state', 'labels', 'reactions',
+                      'comment_count', 'created_at', 'updated_at'),
+    'github_issue_comments': ('id', 'issue_id', 'repo', 'author', 'url', 'reactions', 'created_at', 'updated_at'),
+}
+
+
+def select_columns(table: str, fields: Optional[str], ignore_unknown: bool = False) -> Tuple[str, ...]:
+    """Columns for a ``fields`` request parameter, always including ``id``.
+
+    ``fields`` is a comma-separated list of column names, ``*`` for every
+    column, or empty for the table's ``SUMMARY_COLUMNS``. Unknown names raise
+    ``ValueError`` unless ``ignore_unknown`` drops them.
+    """
+    if not fields or not fields.strip():
+        return SUMMARY_COLUMNS[table]
+    if fields.strip() == '*':
+        return COLUMNS[table]
+    columns = ['id']
+    for name in (part.strip() for part in fields.split(',')):
+        if name and name not in columns:
+            if name in COLUMNS[table]:
+                columns.append(name)
+            elif not ignore_unknown:
+                raise ValueError(f'Unknown field for {table}: {name}')
+    return tuple(columns)
+
+
+@dataclass
+class PushReport:
+    """Outcome of one bulk upsert."""
+    table: str
+    written: List[str] = field(default_factory=list)
+    failed: List[str] = field(default_factory=list)
+    elapsed: float = 0.0
+    requests: int = 0
+
+    def as_dict(self) -> Dict:
+        return {'table': self.table, 'written': len(self.written), 'failed': len(self.failed),
+                'elapsed_sec': round(self.elapsed, 3), 'requests': self.requests}
+
+
+class StorageBackend:
+    """Operations the job and the API need from a store.
+
+    ``eq`` maps columns to required values, ``contains`` maps array columns to
+    values that must all be present, ``not_null`` lists columns that must be
+    set. ``search`` keeps rows matching the text in the table's
+    ``SEARCH_COLUMNS``.
+
+    ``list`` orders by ``order`` and then ``id``, so ``after=(value, id)``,
+    taken from the last row of a page, continues right after that row
+    (keyset pagination); the order column must not be null for this.
+    """
+
+    name = 'base'
+
+    @property
+    def configured(self) -> bool:
+        return True
+
+    def ping(self) -> bool:
+        """Whether the store answers a trivial query."""
+        raise NotImplementedError
+
+    def upsert(self, table: str, rows: List[Dict]) -> PushReport:
+        raise NotImplementedError
+
+    def get(self, table: str, id: str, columns: Optional[Sequence[str]] = None) -> Optional[Dict]:
+        raise NotImplementedError
+
+    def list(self, table: str, *, columns: Optional[Sequence[str]] = None,
+             eq: Optional[Mapping[str, Any]] = None, contains: Optional[Mapping[str, List]] = None,
+             not_null: Sequence[str] = (), search: Optional[str] = None, order: Optional[str] = None,
+             desc: bool = True, limit: int = 50, offset: int = 0,
+             after: Optional[Sequence] = None) -> List[Dict]:
+        raise NotImplementedError
+
+    def search(self, table: str, text: str, *, columns: Optional[Sequence[str]] = None,
+               eq: Optional[Mapping[str, Any]] = None, limit: int = 20) -> List[Dict]:
+        """Rows matching ``text``, best matches first where the backend can rank."""
+        raise NotImplementedError
+
+    def fuzzy(self, table: str, text: str, *, columns: Optional[Sequence[str]] = None,
+              limit: int = 20) -> List[Dict]:
+        """Rows whose ``FUZZY_COLUMNS`` value is most similar to ``text`` by trigrams, best first."""
+        raise NotImplementedError
+
+    async def asearch(self, table: str, text: str, **kwargs: Any) -> List[Dict]:
+        """``search`` for async callers.
+
+        Backends without an async client run the call in a worker thread, which
+        keeps running if the awaiting task is cancelled.
+        """
+        return await asyncio.to_thread(self.search, table, text, **kwargs)
+
+    async def afuzzy(self, table: str, text: str, **kwargs: Any) -> List[Dict]:
+        """``fuzzy`` for async callers; see ``asearch``."""
+        return await asyncio.to_thread(self.fuzzy, table, text, **kwargs)
+
+    def count(self, table: str, eq: Optional[Mapping[str, Any]] = None) -> int:
+        raise NotImplementedError
+
+    def delete(self, table: str, eq: Mapping[str, Any], gte: Optional[Mapping[str, Any]] = None) -> None:
+        """Delete rows matching ``eq`` whose ``gte`` columns are at least the given values."""
+        raise NotImplementedError
+
+
+_storage: Optional[StorageBackend] = None
+_storage_lock = threading.Lock()
+
+
+def get_storage() -> StorageBackend:
+    """The process-wide backend selected by ``STORAGE_BACKEND``."""
+    global _storage
+    with _storage_lock:
+        if _storage is None:
+            if STORAGE_BACKEND == 'sqlite':
+                from storage.sqlite_backend import SQLiteBackend
+                _storage = SQLiteBackend()
+            else:
+                if STORAGE_BACKEND != 'supabase':
+                    LOG.warning('Unknown STORAGE_BACKEND %r; using supabase', STORAGE_BACKEND)
+                from storage.supabase_backend import SupabaseBackend
+                _storage = SupabaseBackend()
+            LOG.info('Using %s storage', _storage.name)
+        return _storage
@@ -0,0 +1,284 @@
+"""``StorageBackend`` in a local SQLite file, for single-node deployments.
+
+Each table keeps one JSON document per row, so rows with new keys need no
+migration; upserts merge the new keys over the stored row the way a
+PostgREST upsert only touches the columns it sends. Sort and filter columns
+get expression indexes, and the ``SEARCH_COLUMNS`` of each table are indexed
+by an FTS5 table whose rowids follow the main table's, so search is ranked
+by BM25 rather than a ``LIKE`` scan. ``fuzzy`` lookups use an in-memory
+trigram index over the ``FUZZY_COLUMNS``, built on first use and kept up to
+date by ``upsert``.
+"""
+import json
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Mapping, Optional, Sequence, Tuple
+
+from storage.backend import FUZZY_COLUMNS, SEARCH_COLUMNS, PushReport, StorageBackend
+from storage.trigram import TrigramIndex
+
+LOG = logging.getLogger(__name__)
+
+SQLITE_DB_PATH = os.getenv('SQLITE_DB_PATH', os.path.join('data', 'knowledge.db'))
+
+# Expression indexes per table, mirroring sql/init_tables.sql. Sort keys end
+# in ``id`` so ordered and keyset-paginated lists are index walks.
+INDEXES = {
+    'flutter_docs': [('updated_at', 'id')],
+    'flutter_doc_chunks': [('doc_id', 'position')],
+    'pub_packages': [('updated_at', 'id'), ('popularity', 'id'), ('likes', 'id'), ('points', 'id')],
+    'github_issues': [('created_at', 'id'), ('repo', 'created_at', 'id'), ('state', 'created_at', 'id')],
+    'github_issue_comments': [('issue_id', 'created_at')],
+}
+# Tables whose ``updated_at`` defaults to the insert time.
+UPDATED_AT_DEFAULT = {'flutter_docs', 'flutter_doc_chunks', 'pub_packages', 'sync_stats'}
+
+_NAME = re.compile(r'^[a-z_][a-z0-9_]*$')
+# Ids per ``in (...)`` list, well under SQLite's variable limit.
+_ID_BATCH = 500
+
+
+def _name(name: str) -> str:
+    if not _NAME.match(name):
+        raise ValueError(f'Invalid table or column name: {name!r}')
+    return name
+
+
+def _col(column: str, ref: str = 'data') -> str:
+    """SQL for a row's column; the same text the expression indexes use."""
+    return f"json_extract({ref}, '$.{_name(column)}')"
+
+
+def fts_query(text: str) -> str:
+    """An FTS5 query matching every word of ``text``, with operators taken literally."""
+    terms = re.findall(r'\w+', text)
+    return ' '.join('"' + term.replace('"', '""') + '"' for term in terms)
+
+
+class SQLiteBackend(StorageBackend):
+    name = 'sqlite'
+
+    def __init__(self, path: str = SQLITE_DB_PATH):
+        if path != ':memory:' and os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.path = path
+        self._lock = threading.Lock()
+        self._tables = set()
+        self._trigrams: Dict[str, TrigramIndex] = {}
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        for table in SEARCH_COLUMNS:
+            self._ensure(table)
+
+    def _ensure(self, table: str) -> str:
+        """Create ``table``, its indexes and its FTS table if needed; call with the lock held or at init."""
+        if table in self._tables:
+            return table
+        _name(table)
+        with self.conn:
+            self.conn.execute(f'create table if not exists {table} (id text primary key, data text not null)')
+            for columns in INDEXES.get(table, ()):
+                self.conn.execute(
+                    f"create index if not exists {table}_{'_'.join(columns)}_idx"
+                    f" on {table} ({', '.join(_col(c) for c in columns)})"
+                )
+            if table in SEARCH_COLUMNS:
+                self.conn.execute(
+                    f"create virtual table if not exists {table}_fts using fts5("
+                    f"{', '.join(SEARCH_COLUMNS[table])}, tokenize='porter unicode61')"
+                )
+        self._tables.add(table)
+        return table
+
+    def _where(self, eq: Optional[Mapping[str, Any]] = None, contains: Optional[Mapping[str, List]] = None,
+               not_null: Sequence[str] = (), gte: Optional[Mapping[str, Any]] = None,
+               ref: str = 'data') -> Tuple[List[str], List]:
+        clauses: List[str] = []
+        params: List = []
+        for column, value in (eq or {}).items():
+            clauses.append(f'{_col(column, ref)} = ?')
+            params.append(value)
+        for column, values in (contains or {}).items():
+            for value in values:
+                clauses.append(f"exists (select 1 from json_each({ref}, '$.{_name(column)}') where value = ?)")
+                params.append(value)
+        for column in not_null:
+            clauses.append(f'{_col(column, ref)} is not null')
+        for column, value in (gte or {}).items():
+            clauses.append(f'{_col(column, ref)} >= ?')
+            params.append(value)
+        return clauses, params
+
+    @staticmethod
+    def _row(data: str, columns: Optional[Sequence[str]]) -> Dict:
+        row = json.loads(data)
+        return {c: row.get(c) for c in columns} if columns else row
+
+    def ping(self) -> bool:
+        try:
+            with self._lock:
+                self.conn.execute('select 1').fetchone()
+            return True
+        except sqlite3.Error as e:
+            LOG.warning('SQLite health check failed: %s', e)
+            return False
+
+    def upsert(self, table: str, rows: List[Dict]) -> PushReport:
+        report = PushReport(table)
+        start = time.perf_counter()
+        now = datetime.now(timezone.utc).isoformat()
+        with self._lock:
+            self._ensure(table)
+            search = SEARCH_COLUMNS.get(table)
+            trigrams = self._trigrams.get(table)
+            for i in range(0, len(rows), _ID_BATCH):
+                batch = rows[i:i + _ID_BATCH]
+                ids = [str(row['id']) for row in batch]
+                marks = ','.join('?' * len(ids))
+                rowids = []
+                try:
+                    with self.conn:
+                        stored = dict(self.conn.execute(
+                            f'select id, data from {table} where id in ({marks})', ids).fetchall())
+                        merged = {}
+                        for id, row in zip(ids, batch):
+                            if id in merged:
+                                data = merged[id]
+                            elif id in stored:
+                                data = json.loads(stored[id])
+                            else:
+                                data = {}
+                            if not data and table in UPDATED_AT_DEFAULT:
+                                data['updated_at'] = now
+                            data.update(row)
+                            merged[id] = data
+                        self.conn.executemany(
+                            f'insert into {table} (id, data) values (?, ?)'
+                            ' on conflict(id) do update set data = excluded.data',
+                            [(id, json.dumps(data)) for id, data in merged.items()],
+                        )
+                        if search or trigrams is not None:
+                            rowids = self.conn.execute(
+                                f'select rowid, id from {table} where id in ({marks})', ids).fetchall()
+                        if search:
+                            self.conn.executemany(f'delete from {table}_fts where rowid = ?',
+                                                  [(rowid,) for rowid, _ in rowids])
+                            self.conn.executemany(
+                                f"insert into {table}_fts (rowid, {', '.join(search)})"
+                                f" values (?{', ?' * len(search)})",
+                                [(rowid, *(merged[id].get(c) or '' for c in search)) for rowid, id in rowids],
+                            )
+                except (sqlite3.Error, TypeError, ValueError) as e:
+                    LOG.error('Error upserting %d rows to %s: %s', len(batch), table, e)
+                    report.failed.extend(ids)
+                else:
+                    report.written.extend(ids)
+                    if trigrams is not None:
+                        for rowid, id in rowids:
+                            trigrams.add(rowid, merged[id].get(FUZZY_COLUMNS[table]))
+                report.requests += 1
+        report.elapsed = time.perf_counter() - start
+        LOG.info('Stored %d rows in %s (%.3fs, %d failed)', len(report.written), table,
+                 report.elapsed, len(report.failed))
+        return report
+
+    def get(self, table: str, id: str, columns: Optional[Sequence[str]] = None) -> Optional[Dict]:
+        with self._lock:
+            found = self.conn.execute(f'select data from {self._ensure(table)} where id = ?', (id,)).fetchone()
+        return self._row(found[0], columns) if found else None
+
+    def list(self, table: str, *, columns: Optional[Sequence[str]] = None,
+             eq: Optional[Mapping[str, Any]] = None, contains: Optional[Mapping[str, List]] = None,
+             not_null: Sequence[str] = (), search: Optional[str] = None, order: Optional[str] = None,
+             desc: bool = True, limit: int = 50, offset: int = 0,
+             after: Optional[Sequence] = None) -> List[Dict]:
+        clauses, params = self._where(eq, contains, not_null)
+        if after is not None:
+            if not order:
+                raise ValueError('after needs an order column')
+            # (order, id) past ``after``, spelled so the first term bounds an index range.
+            op = '<' if desc else '>'
+            clauses.append(f"{_col(order)} {op}= ? and ({_col(order)} {op} ? or {_col('id')} {op} ?)")
+            params.extend([after[0], after[0], after[1]])
+        if search:
+            query = fts_query(search)
+            if not query:
+                return []
+            clauses.append(f'rowid in (select rowid from {table}_fts where {table}_fts match ?)')
+            params.append(query)
+        sql = f'select data from {table}'
+        if clauses:
+            sql += ' where ' + ' and '.join(clauses)
+        if order:
+            direction = 'desc' if desc else 'asc'
+            sql += f" order by {_col(order)} {direction}, {_col('id')} {direction}"
+        sql += ' limit ? offset ?'
+        with self._lock:
+            self._ensure(table)
+            found = self.conn.execute(sql, params + [limit, offset]).fetchall()
+        return [self._row(data, columns) for data, in found]
+
+    def search(self, table: str, text: str, *, columns: Optional[Sequence[str]] = None,
+               eq: Optional[Mapping[str, Any]] = None, limit: int = 20) -> List[Dict]:
+        query = fts_query(text)
+        if not query:
+            return []
+        clauses, params = self._where(eq, ref='t.data')
+        sql = (f'select t.data from {table}_fts f join {table} t on t.rowid = f.rowid'
+               f' where {table}_fts match ?')
+        sql += ''.join(' and ' + clause for clause in clauses)
+        sql += f' order by bm25({table}_fts) limit ?'
+        with self._lock:
+            self._ensure(table)
+            found = self.conn.execute(sql, [query] + params + [limit]).fetchall()
+        return [self._row(data, columns) for data, in found]
+
+    def _trigram_index(self, table: str) -> TrigramIndex:
+        """The trigram index of ``table``'s fuzzy column, built on first use; call with the lock held."""
+        index = self._trigrams.get(table)
+        if index is None:
+            start = time.perf_counter()
+            index = TrigramIndex()
+            for rowid, value in self.conn.execute(
+                    f'select rowid, {_col(FUZZY_COLUMNS[table])} from {self._ensure(table)}'):
+                index.add(rowid, value)
+            self._trigrams[table] = index
+            LOG.info('Built trigram index of %s.%s: %d rows (%.2fs)', table, FUZZY_COLUMNS[table],
+                     len(index), time.perf_counter() - start)
+        return index
+
+    def fuzzy(self, table: str, text: str, *, columns: Optional[Sequence[str]] = None,
+              limit: int = 20) -> List[Dict]:
+        if table not in FUZZY_COLUMNS:
+            raise ValueError(f'No fuzzy lookup for {table}')
+        with self._lock:
+            hits = [rowid for rowid, _ in self._trigram_index(table).lookup(text, limit)]
+            if not hits:
+                return []
+            found = dict(self.conn.execute(
+                f"select rowid, data from {table} where rowid in ({','.join('?' * len(hits))})", hits).fetchall())
+        return [self._row(found[rowid], columns) for rowid in hits if rowid in found]
+
+    def count(self, table: str, eq: Optional[Mapping[str, Any]] = None) -> int:
+        clauses, params = self._where(eq)
+        sql = f'select count(*) from {table}' + (' where ' + ' and '.join(clauses) if clauses else '')
+        with self._lock:
+            self._ensure(table)
+            return self.conn.execute(sql, params).fetchone()[0]
+
+    def delete(self, table: str, eq: Mapping[str, Any], gte: Optional[Mapping[str, Any]] = None) -> None:
+        clauses, params = self._where(eq, gte=gte)
+        where = ' where ' + ' and '.join(clauses) if clauses else ''
+        with self._lock, self.conn:
+            self._ensure(table)
+            # Rebuilt on the next fuzzy lookup.
+            self._trigrams.pop(table, None)
+            if table in SEARCH_COLUMNS:
+                self.conn.execute(f'delete from {table}_fts where rowid in (select rowid from {table}{where})', params)
+            self.conn.execute(f'delete from {table}{where}', params)
@@ -0,0 +1,156 @@
+"""``StorageBackend`` over the Supabase REST API.
+
+The async search calls go straight to PostgREST over the shared async pool
+(``SharedTransport.arequest``), so awaiting them holds no thread and a
+cancelled call abandons its request.
+"""
+import logging
+from typing import Any, Dict, List, Mapping, Optional, Sequence
+
+from postgrest.exceptions import APIError
+
+from storage.backend import COLUMNS, FUZZY_COLUMNS, PushReport, StorageBackend
+from storage.supabase_client import get_client, push_to_supabase
+from utils.transport import get_transport
+
+LOG = logging.getLogger(__name__)
+
+
+# Text search configuration of the ``search_vector`` columns.
+SEARCH_CONFIG = 'english'
+
+
+def _select(table: str, columns: Optional[Sequence[str]]) -> str:
+    return ','.join(columns or COLUMNS.get(table) or ('*',))
+
+
+def _param(query, key: str, value: str):
+    """Add a raw query parameter that postgrest-py 0.13 has no builder method for."""
+    query.params = query.params.add(key, value)
+    return query
+
+
+def _quote(value: Any) -> str:
+    """A PostgREST filter value, quoted so commas and parentheses in it are literal."""
+    return '"' + str(value).replace('\\', '\\\\').replace('"', '\\"') + '"'
+
+
+class SupabaseBackend(StorageBackend):
+    name = 'supabase'
+
+    @property
+    def configured(self) -> bool:
+        return get_client() is not None
+
+    def _table(self, table: str):
+        client = get_client()
+        if client is None:
+            raise RuntimeError('Supabase not configured')
+        return client.table(table)
+
+    def _rpc(self, function: str, table: str, columns: Optional[Sequence[str]], params: Dict) -> List[Dict]:
+        client = get_client()
+        if client is None:
+            raise RuntimeError('Supabase not configured')
+        return _param(client.rpc(function, params), 'select', _select(table, columns)).execute().data
+
+    async def _arpc(self, function: str, table: str, columns: Optional[Sequence[str]],
+                    params: Dict) -> List[Dict]:
+        client = get_client()
+        if client is None:
+            raise RuntimeError('Supabase not configured')
+        session = client.postgrest.session
+        response = await get_transport().arequest(
+            'POST', f"{str(session.base_url).rstrip('/')}/rpc/{function}",
+            params={'select': _select(table, columns)}, json=params,
+            headers=dict(session.headers), timeout=session.timeout,
+        )
+        if response.is_error:
+            try:
+                raise APIError(response.json())
+            except ValueError:
+                raise APIError({'message': response.text, 'code': str(response.status_code)})
+        return response.json()
+
+    def ping(self) -> bool:
+        try:
+            self._table('flutter_docs').select('id').limit(1).execute()
+            return True
+        except Exception as e:
+            LOG.warning('Supabase health check failed: %s', e)
+            return False
+
+    def upsert(self, table: str, rows: List[Dict]) -> PushReport:
+        return push_to_supabase(table, rows)
+
+    def get(self, table: str, id: str, columns: Optional[Sequence[str]] = None) -> Optional[Dict]:
+        res = self._table(table).select(_select(table, columns)).eq('id', id).limit(1).execute()
+        return res.data[0] if res.data else None
+
+    def _filter(self, query, table: str, eq: Optional[Mapping[str, Any]] = None,
+                contains: Optional[Mapping[str, List]] = None, not_null: Sequence[str] = (),
+                search: Optional[str] = None):
+        for column, value in (eq or {}).items():
+            query = query.eq(column, value)
+        for column, values in (contains or {}).items():
+            query = query.contains(column, list(values))
+        for column in not_null:
+            query = query.not_.is_(column, 'null')
+        if search:
+            # websearch_to_tsquery against the GIN-indexed search_vector column.
+            query = query.filter('search_vector', f'wfts({SEARCH_CONFIG})', search)
+        return query
+
+    def list(self, table: str, *, columns: Optional[Sequence[str]] = None,
+             eq: Optional[Mapping[str, Any]] = None, contains: Optional[Mapping[str, List]] = None,
+             not_null: Sequence[str] = (), search: Optional[str] = None, order: Optional[str] = None,
+             desc: bool = True, limit: int = 50, offset: int = 0,
+             after: Optional[Sequence] = None) -> List[Dict]:
+        query = self._table(table).select(_select(table, columns))
+        query = self._filter(query, table, eq, contains, not_null, search)
+        if after is not None:
+            if not order:
+                raise ValueError('after needs an order column')
+            # (order, id) past ``after``; the plain bound lets Postgres start the index scan there.
+            op = 'lt' if desc else 'gt'
+            query = query.filter(order, f'{op}e', after[0])
+            value, id = map(_quote, after)
+            query = _param(query, 'or', f'({order}.{op}.{value},and({order}.eq.{value},id.{op}.{id}))')
+        if order:
+            direction = '.desc' if desc else ''
+            query = _param(query, 'order', f'{order}{direction},id{direction}')
+        return query.range(offset, offset + limit - 1).execute().data
+
+    def search(self, table: str, text: str, *, columns: Optional[Sequence[str]] = None,
+               eq: Optional[Mapping[str, Any]] = None, limit: int = 20) -> List[Dict]:
+        """Rows ranked by relevance, from the ``search_<table>`` function in sql/init_tables.sql."""
+        return self._rpc(f'search_{table}', table, columns,
+                         {'q': text, 'max_results': limit, 'filters': dict(eq or {})})
+
+    def fuzzy(self, table: str, text: str, *, columns: Optional[Sequence[str]] = None,
+              limit: int = 20) -> List[Dict]:
+        """Rows from the pg_trgm-backed ``fuzzy_<table>`` function in sql/init_tables.sql."""
+        if table not in FUZZY_COLUMNS:
+            raise ValueError(f'No fuzzy lookup for {table}')
+        return self._rpc(f'fuzzy_{table}', table, columns, {'q': text, 'max_results': limit})
+
+    async def asearch(self, table: str, text: str, *, columns: Optional[Sequence[str]] = None,
+                      eq: Optional[Mapping[str, Any]] = None, limit: int = 20) -> List[Dict]:
+        return await self._arpc(f'search_{table}', table, columns,
+                                {'q': text, 'max_results': limit, 'filters': dict(eq or {})})
+
+    async def afuzzy(self, table: str, text: str, *, columns: Optional[Sequence[str]] = None,
+                     limit: int = 20) -> List[Dict]:
+        if table not in FUZZY_COLUMNS:
+            raise ValueError(f'No fuzzy lookup for {table}')
+        return await self._arpc(f'fuzzy_{table}', table, columns, {'q': text, 'max_results': limit})
+
+    def count(self, table: str, eq: Optional[Mapping[str, Any]] = None) -> int:
+        res = self._filter(self._table(table).select('id', count='exact'), table, eq).limit(1).execute()
+        return res.count or 0
+
+    def delete(self, table: str, eq: Mapping[str, Any], gte: Optional[Mapping[str, Any]] = None) -> None:
+        query = self._filter(self._table(table).delete(), table, eq)
+        for column, value in (gte or {}).items():
+            query = query.gte(column, value)
+        query.execute()
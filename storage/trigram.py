@@ -0,0 +1,75 @@
+"""In-process trigram index for typo-tolerant lookups on the SQLite backend.
+
+Text is cut into trigrams the way Postgres' pg_trgm does it: lower-cased,
+split into alphanumeric words, and each word padded with two spaces in front
+and one behind. A value matches a query when it contains at least
+``WORD_SIMILARITY`` of the query's trigrams (pg_trgm's ``<%``), and matches
+rank by similarity of the whole strings, so the closest names come before
+longer ones that merely contain the query.
+
+A value that shares none of the query's ``n - need + 1`` rarest trigrams
+cannot reach ``need`` shared ones, so only those posting lists are scanned
+for candidates; the long lists of common trigrams (``flutter_`` and the
+like) are never walked.
+"""
+import heapq
+import math
+import re
+from collections import defaultdict
+from typing import Dict, FrozenSet, List, Optional, Set, Tuple
+
+# pg_trgm's default pg_trgm.word_similarity_threshold.
+WORD_SIMILARITY = 0.6
+
+_WORD = re.compile(r'[^\W_]+')
+
+
+def trigrams(text: str) -> FrozenSet[str]:
+    grams = set()
+    for word in _WORD.findall(text.lower()):
+        padded = f'  {word} '
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return frozenset(grams)
+
+
+class TrigramIndex:
+    """Trigram postings for one text column, keyed by integer row keys; not thread-safe."""
+
+    def __init__(self):
+        self.postings: Dict[str, Set[int]] = defaultdict(set)
+        self.grams: Dict[int, FrozenSet[str]] = {}
+
+    def __len__(self) -> int:
+        return len(self.grams)
+
+    def add(self, key: int, text: Optional[str]) -> None:
+        """Index ``text`` under ``key``, replacing what ``key`` had."""
+        self.discard(key)
+        grams = trigrams(text or '')
+        if grams:
+            self.grams[key] = grams
+            for gram in grams:
+                self.postings[gram].add(key)
+
+    def discard(self, key: int) -> None:
+        for gram in self.grams.pop(key, ()):
+            keys = self.postings[gram]
+            keys.discard(key)
+            if not keys:
+                del self.postings[gram]
+
+    def lookup(self, text: str, limit: int = 20, threshold: float = WORD_SIMILARITY) -> List[Tuple[int, float]]:
+        """``(key, similarity)`` of the best matches for ``text``, best first."""
+        query = trigrams(text)
+        if not query:
+            return []
+        need = max(1, math.ceil(threshold * len(query) - 1e-9))
+        lists = sorted((self.postings.get(gram, ()) for gram in query), key=len)
+        candidates = set().union(*lists[:len(query) - need + 1])
+        scored = []
+        for key in candidates:
+            grams = self.grams[key]
+            shared = len(query & grams)
+            if shared >= need:
+                scored.append((shared / (len(query) + len(grams) - shared), shared / len(query), -key))
+        return [(-key, similarity) for similarity, _, key in heapq.nlargest(limit, scored)]
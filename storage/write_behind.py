@@ -0,0 +1,116 @@
+"""Write-behind queue between the fetchers and storage.
+
+The sync job hands each fetched batch to ``WriteBehind.submit`` and goes on
+fetching while writer threads store earlier batches. The queue is bounded:
+when storage falls behind, ``submit`` blocks until a writer frees a slot, so
+memory stays flat and the fetchers slow down to the pace storage can take.
+``flush`` waits for everything queued so far; call it before advancing any
+sync cursor that assumes the rows are stored.
+
+Jobs run in submission order with one writer. With more, jobs may finish
+out of order, so keep writes that depend on each other in one job.
+"""
+import logging
+import os
+import queue
+import threading
+import time
+from typing import Any, Callable, Dict, Optional
+
+LOG = logging.getLogger(__name__)
+
+# Batches waiting to be written before the fetchers are held back.
+STORAGE_WRITE_QUEUE = int(os.getenv('STORAGE_WRITE_QUEUE', '4'))
+STORAGE_WRITERS = int(os.getenv('STORAGE_WRITERS', '1'))
+
+
+class WriteError(Exception):
+    """A queued write raised; the first failure is chained as the cause."""
+
+
+class WriteBehind:
+    """Use as ``with WriteBehind() as writer: writer.submit(fn, *args)``; leaving the block drains the queue."""
+
+    def __init__(self, writers: int = STORAGE_WRITERS, max_pending: int = STORAGE_WRITE_QUEUE):
+        self.queue: 'queue.Queue[Optional[tuple]]' = queue.Queue(maxsize=max(1, max_pending))
+        self.error: Optional[BaseException] = None
+        self.counters = {'jobs': 0, 'failed': 0, 'blocked': 0, 'blocked_sec': 0.0, 'max_depth': 0}
+        self._lock = threading.Lock()
+        self._threads = [threading.Thread(target=self._run, name=f'storage-writer-{i}', daemon=True)
+                         for i in range(max(1, writers))]
+        self._closed = False
+        for thread in self._threads:
+            thread.start()
+
+    def __enter__(self) -> 'WriteBehind':
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def _run(self) -> None:
+        while True:
+            item = self.queue.get()
+            try:
+                if item is None:
+                    return
+                fn, args, kwargs = item
+                try:
+                    fn(*args, **kwargs)
+                except Exception as e:
+                    LOG.exception('Storage write failed: %s', e)
+                    with self._lock:
+                        self.counters['failed'] += 1
+                        if self.error is None:
+                            self.error = e
+            finally:
+                self.queue.task_done()
+
+    def _check(self) -> None:
+        if self.error is not None:
+            raise WriteError(f'{self.counters["failed"]} storage writes failed') from self.error
+
+    def submit(self, fn: Callable[..., Any], *args: Any, **kwargs: Any) -> None:
+        """Queue ``fn(*args, **kwargs)``, blocking while the queue is full.
+
+        Raises ``WriteError`` once any earlier write has failed, so the caller
+        stops fetching data it can no longer store.
+        """
+        if self._closed:
+            raise RuntimeError('WriteBehind is closed')
+        self._check()
+        try:
+            self.queue.put_nowait((fn, args, kwargs))
+        except queue.Full:
+            start = time.perf_counter()
+            self.queue.put((fn, args, kwargs))
+            with self._lock:
+                self.counters['blocked'] += 1
+                self.counters['blocked_sec'] += time.perf_counter() - start
+        with self._lock:
+            self.counters['jobs'] += 1
+            self.counters['max_depth'] = max(self.counters['max_depth'], self.queue.qsize())
+
+    def flush(self) -> None:
+        """Wait until every queued write has run; raise ``WriteError`` if any failed."""
+        self.queue.join()
+        self._check()
+
+    def close(self) -> None:
+        """Drain the queue and stop the writers; failures are left for ``flush`` to report."""
+        if self._closed:
+            return
+        self._closed = True
+        for _ in self._threads:
+            self.queue.put(None)
+        for thread in self._threads:
+            thread.join()
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return dict(self.counters)
+
+    def log_stats(self) -> None:
+        s = self.stats()
+        LOG.info('Storage writes: %d batches, %d failed; fetchers waited %d times (%.1fs) on a full queue, '
+                 'max depth %d', s['jobs'], s['failed'], s['blocked'], s['blocked_sec'], s['max_depth'])
@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+"""
+Test chunked bulk upserts against a fake Supabase client
+"""
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from postgrest.exceptions import APIError
+import storage.supabase_client as sc
+import logging
+
+logging.basicConfig(level=logging.INFO)
+LOG = logging.getLogger(__name__)
+
+class FakeTable:
+    def __init__(self, client, name):
+        self.client, self.name = client, name
+
+    def upsert(self, rows, **kwargs):
+        self.rows = rows
+        return self
+
+    def execute(self):
+        self.client.requests.append([row['id'] for row in self.rows])
+        if any(row.get('bad') for row in self.rows):
+            raise APIError({'message': 'bad row', 'code': '22P02'})
+        if len({frozenset(row) for row in self.rows}) > 1:
+            raise APIError({'message': 'All object keys must match', 'code': 'PGRST102'})
+        self.client.stored.extend(row['id'] for row in self.rows)
+
+class FakeClient:
+    def __init__(self):
+        self.requests, self.stored = [], []
+
+    def table(self, name):
+        return FakeTable(self, name)
+
+def push(rows, **kwargs):
+    fake, original = FakeClient(), sc._client
+    sc._client = fake
+    try:
+        return sc.push_to_supabase('pub_packages', rows, **kwargs), fake
+    finally:
+        sc._client = original
+
+def test_chunks():
+    """Rows go out in chunks, one key set per request"""
+    rows = [{'id': str(i), 'name': 'x'} for i in range(10)] + [{'id': 'e', 'name': 'x', 'likes': 1}]
+    report, fake = push(rows, chunk_size=4)
+    assert len(report.written) == 11 and not report.failed
+    assert [len(r) for r in fake.requests] == [4, 4, 2, 1]
+
+def test_split_on_failure():
+    """A rejected chunk is bisected until the bad row is isolated"""
+    rows = [{'id': str(i), 'bad': i == 5} for i in range(8)]
+    report, fake = push(rows, chunk_size=8, workers=4)
+    assert report.failed == ['5'] and sorted(report.written) == sorted(set(map(str, range(8))) - {'5'})
+    assert report.requests == len(fake.requests) == 7
+    LOG.info("✅ Push report: %s", report.as_dict())
+
+if __name__ == "__main__":
+    test_chunks()
+    test_split_on_failure()
@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+"""
+Test that the docs crawler only remembers pages the consumer confirmed as stored
+"""
+import sys
+import os
+import tempfile
+from unittest import mock
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import utils.state
+import fetch.docs_crawler as docs_crawler
+from fetch.docs_crawler import DocsCrawler, Frontier
+from fetch.engine import FetchResult
+from fetch.http_cache import ValidatorCache
+import logging
+
+logging.basicConfig(level=logging.INFO)
+LOG = logging.getLogger(__name__)
+
+PAGES = ['https://docs.flutter.dev/a', 'https://docs.flutter.dev/b']
+
+class FakeFetcher:
+    def __init__(self, **kwargs):
+        pass
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        pass
+
+    async def fetch_many(self, urls):
+        return [FetchResult(url, 200, '<p>page</p>', {'etag': f'"{url}"', 'content-type': 'text/html'})
+                for url in urls]
+
+def test_unconfirmed_pages_are_refetched():
+    """A page whose write failed keeps no validator and is crawled again"""
+    with mock.patch.object(utils.state, 'SYNC_STATE_DIR', tempfile.mkdtemp()), \
+            mock.patch.object(docs_crawler, 'AsyncFetcher', FakeFetcher):
+        frontier, validators = Frontier('frontier_test.db'), ValidatorCache('validators_test.db')
+        frontier.add(PAGES, 1.0)
+
+        def make_crawler():
+            return DocsCrawler(parse=lambda url, html, requested: ({'id': url, 'url': url}, []),
+                               frontier=frontier, validators=validators)
+
+        crawler = make_crawler()
+        batches = list(crawler.crawl())
+        assert [row['url'] for row in batches[0]] == PAGES
+        # Only page a was stored.
+        crawler.confirm([batches[0][0]])
+        assert validators.headers_for(PAGES[0]) == {'If-None-Match': f'"{PAGES[0]}"'}
+        assert validators.headers_for(PAGES[1]) == {}
+        assert frontier.count('done') == 1 and frontier.count('yielded') == 1
+
+        # An interrupted run resumes with page b only.
+        frontier.add(['https://docs.flutter.dev/c'], 0.5)
+        crawler = make_crawler()
+        urls = [row['url'] for batch in crawler.crawl() for row in batch]
+        assert urls == [PAGES[1], 'https://docs.flutter.dev/c']
+        LOG.info("✅ Unconfirmed pages were crawled again")
+
+if __name__ == "__main__":
+    test_unconfirmed_pages_are_refetched()
+    LOG.info("🎉 Docs crawler tests passed!")
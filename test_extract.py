@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+"""
+Test the lxml HTML extraction path
+"""
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from fetch.chunks import build_chunks
+from fetch.extract import extract_page
+import logging
+
+logging.basicConfig(level=logging.INFO)
+LOG = logging.getLogger(__name__)
+
+PAGE = """
+<html><head><title>Layouts &amp; widgets | Flutter</title><script>var x = "<main>";</script></head>
+<body>
+  <nav><a href="/nav">Nav link</a></nav>
+  <main>
+    <h1>Layouts</h1><p>Everything is a <code>Widget</code>.</p>
+    <ul><li>Row</li><li>Column</li></ul>
+    <a href='/ui/layout#rows'>Rows</a>
+  </main>
+  <footer>Footer text</footer>
+</body></html>
+"""
+
+def test_extract():
+    """Extract title, main text and links from a page"""
+    LOG.info("Testing lxml extraction...")
+    page = extract_page(PAGE)
+    assert page.title == 'Layouts & widgets | Flutter'
+    assert page.text.splitlines() == ['Layouts', 'Everything is a Widget.', 'Row', 'Column', 'Rows']
+    assert 'Footer' not in page.text and 'Nav link' not in page.text
+    assert page.links == ['/nav', '/ui/layout#rows']
+    LOG.info("✅ Extraction successful!")
+
+def test_extract_without_main():
+    """Fall back to the document body when there is no <main>"""
+    page = extract_page('<html><body><div><p>Hello</p><p>world</p></div></body></html>')
+    assert page.text == 'Hello\nworld'
+    assert extract_page('').text == ''
+
+def test_sections_and_chunks():
+    """Split on h2/h3 headings into anchored chunks"""
+    page = extract_page(
+        '<main><p>Intro</p><h2 id="rows">Rows</h2><p>Row text</p>'
+        '<h3><a href="#cols">Columns</a></h3><p>Col text</p></main>'
+    )
+    assert page.text == 'Intro\nRows\nRow text\nColumns\nCol text'
+    chunks = build_chunks('docs-ui', 'https://docs.flutter.dev/ui', 'UI', page.sections)
+    assert [c['id'] for c in chunks] == ['docs-ui:0', 'docs-ui:1', 'docs-ui:2']
+    assert [c['heading'] for c in chunks] == ['UI', 'Rows', 'Columns']
+    assert chunks[1]['url'] == 'https://docs.flutter.dev/ui#rows'
+    assert chunks[2]['url'] == 'https://docs.flutter.dev/ui#cols'
+    assert chunks[2]['content'] == 'Columns\nCol text' and chunks[2]['token_count'] == 3
+
+if __name__ == "__main__":
+    test_extract()
+    test_extract_without_main()
+    test_sections_and_chunks()
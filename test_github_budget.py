@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""
+Test the GitHub rate-limit budget
+"""
+import sys
+import os
+import time
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from fetch.github_budget import HIGH, LOW, RateBudget
+import logging
+
+logging.basicConfig(level=logging.INFO)
+LOG = logging.getLogger(__name__)
+
+def headers(remaining, reset_in, limit=5000):
+    return {
+        'x-ratelimit-limit': str(limit),
+        'x-ratelimit-remaining': str(remaining),
+        'x-ratelimit-reset': str(int(time.time() + reset_in)),
+    }
+
+def test_plenty_of_quota():
+    """Requests go straight through while most of the quota is left"""
+    budget = RateBudget(reserve=100)
+    assert budget.delay() == 0
+    budget.settle(1, headers(4000, 3000))
+    assert budget.delay() == 0 and budget.remaining == 3999
+
+def test_pacing_and_priorities():
+    """Low quota spreads requests over the window and refuses low priority"""
+    budget = RateBudget(reserve=100, pace_below=0.5, low_priority_floor=0.25)
+    budget.update(headers(2100, 2000))
+    assert 0.9 < budget.delay(HIGH) <= 1.0
+    assert budget.delay(LOW) > 0
+    budget.update(headers(1000, 2000))
+    assert budget.delay(LOW) is None
+    assert budget.delay(HIGH) > 0
+
+def test_exhausted():
+    """An empty quota waits for the reset, or gives up if that is too far away"""
+    budget = RateBudget(reserve=100, max_wait=60)
+    budget.update(headers(50, 30))
+    assert 30 <= budget.delay() <= 32
+    budget.update(headers(50, 3000))
+    assert budget.delay() is None
+    stats = budget.stats()
+    assert stats['waits'] == 1 and stats['refused'] == 1
+    LOG.info("✅ Budget stats: %s", stats)
+
+def test_concurrent_reservations():
+    """Concurrent callers reserve their cost and are paced into consecutive slots"""
+    budget = RateBudget(reserve=100, pace_below=0.5)
+    budget.update(headers(2100, 2000))
+    waits = [budget.delay(HIGH, cost=10) for _ in range(3)]
+    assert 9 < waits[0] <= 10 and 9 < waits[1] - waits[0] < 11 and 9 < waits[2] - waits[1] < 11
+    assert budget.remaining == 2070 and budget.in_flight == 30
+    # The first response reports its own cost spent; the other two are still in flight.
+    budget.settle(10, rate_limit={'cost': 10, 'limit': 5000, 'remaining': 2090,
+                                  'resetAt': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime(budget.reset_at))})
+    assert budget.remaining == 2070 and budget.in_flight == 20
+    # A failed request reports nothing; its points stay spent.
+    budget.settle(10)
+    assert budget.remaining == 2070 and budget.in_flight == 10
+    LOG.info("✅ Reservations: %s", budget.stats())
+
+if __name__ == "__main__":
+    test_plenty_of_quota()
+    test_pacing_and_priorities()
+    test_exhausted()
+    test_concurrent_reservations()
@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""
+Test the per-host politeness scheduler
+"""
+import sys
+import os
+import httpx
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from fetch.politeness import RequestScheduler, TokenBucket, retry_after_seconds
+import logging
+
+logging.basicConfig(level=logging.INFO)
+LOG = logging.getLogger(__name__)
+
+class FakeResponse:
+    def __init__(self, status_code, headers=None):
+        self.status_code = status_code
+        self.headers = headers or {}
+
+def test_token_bucket():
+    """Burst is free, then requests are spaced at the bucket rate"""
+    bucket = TokenBucket(rate=10, burst=2)
+    assert bucket.reserve() == 0 and bucket.reserve() == 0
+    assert 0.05 < bucket.reserve() <= 0.1
+    bucket.pause(5)
+    assert bucket.reserve() >= 5
+
+def test_retry_after():
+    assert retry_after_seconds({'Retry-After': '7'}) == 7
+    assert retry_after_seconds({'Retry-After': 'Wed, 21 Oct 2015 07:28:00 GMT'}) == 0
+    assert retry_after_seconds({}) is None
+
+def test_retries():
+    """5xx responses are retried, then the last response is returned"""
+    scheduler = RequestScheduler(rate=0, max_retries=2, backoff_base=0.001)
+    responses = iter([FakeResponse(503), FakeResponse(502), FakeResponse(200)])
+    assert scheduler.run('https://pub.dev/api', lambda: next(responses)).status_code == 200
+    assert scheduler.run('https://pub.dev/api', lambda: FakeResponse(500)).status_code == 500
+    stats = scheduler.stats()['pub.dev']
+    assert stats['requests'] == 6 and stats['retries'] == 4 and stats['failures'] == 1
+    LOG.info("✅ Scheduler stats: %s", stats)
+
+def test_only_transport_errors_are_retried():
+    """Transport errors are retried; other exceptions propagate on the first attempt"""
+    scheduler = RequestScheduler(rate=0, max_retries=2, backoff_base=0.001)
+    calls = []
+
+    def flaky():
+        calls.append(1)
+        if len(calls) == 1:
+            raise httpx.ConnectTimeout('timed out')
+        return FakeResponse(200)
+    assert scheduler.run('https://pub.dev/api', flaky).status_code == 200 and len(calls) == 2
+
+    def broken():
+        calls.append(1)
+        raise ValueError('bad request body')
+    calls.clear()
+    try:
+        scheduler.run('https://pub.dev/api', broken)
+        assert False, "ValueError was swallowed"
+    except ValueError:
+        pass
+    assert len(calls) == 1
+    LOG.info("✅ Only transport errors were retried")
+
+if __name__ == "__main__":
+    test_token_bucket()
+    test_retry_after()
+    test_retries()
+    test_only_transport_errors_are_retried()
@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+Test the local SQLite storage backend
+"""
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from storage.sqlite_backend import SQLiteBackend
+import logging
+
+logging.basicConfig(level=logging.INFO)
+LOG = logging.getLogger(__name__)
+
+ISSUES = [
+    {'id': 'gh-1', 'title': 'Crash when scrolling a ListView', 'body': 'Scrolling crashes on Android',
+     'labels': ['crash', 'framework'], 'state': 'open', 'repo': 'flutter/flutter',
+     'created_at': '2024-01-01T00:00:00Z'},
+    {'id': 'gh-2', 'title': 'Hot reload is slow', 'body': 'Takes seconds',
+     'labels': ['tool'], 'state': 'closed', 'repo': 'flutter/flutter', 'created_at': '2024-02-01T00:00:00Z'},
+    {'id': 'gh-3', 'title': 'Analyzer crashes', 'body': 'The analyzer crashed',
+     'labels': ['crash'], 'state': 'open', 'repo': 'dart-lang/sdk', 'created_at': '2024-03-01T00:00:00Z'},
+]
+
+def test_upsert_merges():
+    """Upserts merge new columns over the stored row and keep the search index current"""
+    store = SQLiteBackend(':memory:')
+    report = store.upsert('github_issues', ISSUES)
+    assert sorted(report.written) == ['gh-1', 'gh-2', 'gh-3'] and not report.failed
+    store.upsert('github_issues', [{'id': 'gh-2', 'title': 'Hot restart is slow', 'state': 'open'}])
+    row = store.get('github_issues', 'gh-2')
+    assert row['title'] == 'Hot restart is slow' and row['body'] == 'Takes seconds'
+    assert store.get('github_issues', 'gh-2', columns=('id', 'state')) == {'id': 'gh-2', 'state': 'open'}
+    assert [r['id'] for r in store.search('github_issues', 'restart')] == ['gh-2']
+    assert store.search('github_issues', 'reload') == []
+    assert store.get('github_issues', 'gh-404') is None
+
+def test_list_filters_and_search():
+    """Filters, ordering and ranked full-text search"""
+    store = SQLiteBackend(':memory:')
+    store.upsert('github_issues', ISSUES)
+    newest = store.list('github_issues', order='created_at')
+    assert [r['id'] for r in newest] == ['gh-3', 'gh-2', 'gh-1']
+    crashes = store.list('github_issues', contains={'labels': ['crash']}, eq={'state': 'open'}, order='created_at')
+    assert [r['id'] for r in crashes] == ['gh-3', 'gh-1']
+    assert [r['id'] for r in store.list('github_issues', eq={'repo': 'dart-lang/sdk'})] == ['gh-3']
+    assert store.count('github_issues') == 3 and store.count('github_issues', eq={'state': 'open'}) == 2
+    # Stemming matches "crashes"/"crashed"; operators in the query are taken literally.
+    assert {r['id'] for r in store.search('github_issues', 'crash')} == {'gh-1', 'gh-3'}
+    assert [r['id'] for r in store.search('github_issues', 'crash', eq={'repo': 'dart-lang/sdk'})] == ['gh-3']
+    assert len(store.search('github_issues', '"crash*')) == 2
+    assert [r['id'] for r in store.list('github_issues', search='analyzer', limit=5)] == ['gh-3']
+
+def test_keyset_pages():
+    """Paging with after=(value, id) visits every row once, ties included"""
+    store = SQLiteBackend(':memory:')
+    store.upsert('github_issues', [{'id': f'gh-{i}', 'created_at': f'2024-01-0{i % 3 + 1}'} for i in range(10)])
+    seen, after = [], None
+    while True:
+        page = store.list('github_issues', order='created_at', limit=4, after=after)
+        seen += [r['id'] for r in page]
+        if len(page) < 4:
+            break
+        after = (page[-1]['created_at'], page[-1]['id'])
+    assert seen == [r['id'] for r in store.list('github_issues', order='created_at', limit=20)]
+    assert len(set(seen)) == 10
+
+def test_delete_range():
+    """Deleting chunks past a position drops them from the search index too"""
+    store = SQLiteBackend(':memory:')
+    chunks = [{'id': f'doc:{i}', 'doc_id': 'doc', 'position': i, 'heading': f'Part {i}', 'content': 'widgets'}
+              for i in range(4)]
+    store.upsert('flutter_doc_chunks', chunks)
+    store.delete('flutter_doc_chunks', {'doc_id': 'doc'}, gte={'position': 2})
+    remaining = store.list('flutter_doc_chunks', eq={'doc_id': 'doc'}, order='position', desc=False)
+    assert [r['position'] for r in remaining] == [0, 1]
+    assert len(store.search('flutter_doc_chunks', 'widgets')) == 2
+    assert store.list('flutter_doc_chunks', order='position')[0]['updated_at']
+
+def test_fuzzy_lookup():
+    """Typo-tolerant name lookups follow later upserts"""
+    store = SQLiteBackend(':memory:')
+    names = ['flutter_bloc', 'bloc', 'riverpod', 'flutter_riverpod', 'provider', 'http']
+    store.upsert('pub_packages', [{'id': name, 'name': name} for name in names])
+    assert [r['name'] for r in store.fuzzy('pub_packages', 'flutter_blok', limit=1)] == ['flutter_bloc']
+    assert [r['name'] for r in store.fuzzy('pub_packages', 'riverpd')] == ['riverpod', 'flutter_riverpod']
+    assert store.fuzzy('pub_packages', 'zzz') == []
+    store.upsert('pub_packages', [{'id': 'riverpod', 'name': 'hooks_riverpod'}])
+    assert [r['name'] for r in store.fuzzy('pub_packages', 'riverpod')] == ['hooks_riverpod', 'flutter_riverpod']
+
+if __name__ == "__main__":
+    test_upsert_merges()
+    test_list_filters_and_search()
+    test_keyset_pages()
+    test_delete_range()
+    test_fuzzy_lookup()
+    LOG.info("🎉 SQLite backend tests passed!")
@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+"""
+Test the shared HTTP transport against a local server
+"""
+import sys
+import os
+import asyncio
+import threading
+import http.server
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from utils.transport import SharedTransport
+import logging
+
+logging.basicConfig(level=logging.INFO)
+LOG = logging.getLogger(__name__)
+
+class Handler(http.server.BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        self.send_response(200)
+        self.send_header('Content-Length', '2')
+        self.end_headers()
+        self.wfile.write(b'ok')
+
+    def log_message(self, *args):
+        pass
+
+def serve():
+    server = http.server.ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f'http://127.0.0.1:{server.server_port}/'
+
+def test_connections_are_reused():
+    """Sync calls and async calls from separate event loops share keep-alive connections"""
+    server, url = serve()
+    try:
+        transport = SharedTransport(http2=False)
+        for _ in range(5):
+            assert transport.request('GET', url).text == 'ok'
+
+        async def burst():
+            return await asyncio.gather(*(transport.arequest('GET', url) for _ in range(4)))
+
+        for _ in range(3):
+            assert all(r.status_code == 200 for r in asyncio.run(burst()))
+        stats = transport.stats()['127.0.0.1']
+        assert stats['requests'] == 17
+        # One sync connection, at most four async ones, reused across loops.
+        assert stats['connections'] <= 5 and stats['reused'] >= 12
+        LOG.info("✅ Connection stats: %s", stats)
+    finally:
+        server.shutdown()
+
+if __name__ == "__main__":
+    test_connections_are_reused()
+    LOG.info("🎉 Transport tests passed!")
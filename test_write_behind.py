@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+"""
+Test the write-behind queue between fetchers and storage
+"""
+import sys
+import os
+import threading
+import time
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from storage.write_behind import WriteBehind, WriteError
+import logging
+
+logging.basicConfig(level=logging.INFO)
+LOG = logging.getLogger(__name__)
+
+def test_overlap_and_backpressure():
+    """Writes run behind the caller, which is held back once the queue is full"""
+    release, started = threading.Event(), threading.Event()
+    written = []
+
+    def write(i):
+        started.set()
+        release.wait(5)
+        written.append(i)
+
+    with WriteBehind(writers=1, max_pending=2) as writer:
+        start = time.perf_counter()
+        writer.submit(write, 0)
+        started.wait(5)
+        for i in (1, 2):  # queued behind the running write
+            writer.submit(write, i)
+        assert time.perf_counter() - start < 1 and not written
+        threading.Timer(0.2, release.set).start()
+        writer.submit(write, 3)  # blocks until a slot frees up
+        writer.flush()
+        assert written == [0, 1, 2, 3]
+        stats = writer.stats()
+        assert stats['jobs'] == 4 and stats['blocked'] == 1 and stats['blocked_sec'] >= 0.1
+    LOG.info("✅ Write-behind stats: %s", stats)
+
+def test_failures_surface():
+    """A failed write is reported by flush and stops further submissions"""
+    def fail():
+        raise ValueError('boom')
+
+    with WriteBehind(writers=2) as writer:
+        writer.submit(fail)
+        try:
+            writer.flush()
+        except WriteError as e:
+            assert isinstance(e.__cause__, ValueError)
+        else:
+            raise AssertionError('flush did not report the failure')
+        try:
+            writer.submit(print, 'never')
+        except WriteError:
+            pass
+        else:
+            raise AssertionError('submit accepted work after a failure')
+
+if __name__ == "__main__":
+    test_overlap_and_backpressure()
+    test_failures_surface()
+    LOG.info("🎉 Write-behind tests passed!")
@@ -0,0 +1,144 @@
+"""Content fingerprints for change detection across sync runs.
+
+Every record gets a stable SHA-256 over its normalized fields. The hashes
+of the last stored version of each record are kept on disk, so a run can
+split its records into new, changed and unchanged ones and only hand the
+first two to storage.
+"""
+import hashlib
+import json
+import threading
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import AbstractSet, Any, Dict, Iterable, List, Optional
+
+from utils.state import connect
+
+# Fields set by the database or by the sync itself, not by the source.
+VOLATILE_FIELDS = frozenset(('updated_at', 'synced_at'))
+
+# Sources whose ``updated_at`` comes from upstream: GitHub bumps it on edits
+# and reactions that change no other stored field, and the incremental sync
+# uses it as its high-water mark.
+VOLATILE_FIELDS_BY_SOURCE = {
+    'github_issues': frozenset(('synced_at',)),
+    'github_issue_comments': frozenset(('synced_at',)),
+}
+
+
+def volatile_fields(source: str) -> AbstractSet[str]:
+    return VOLATILE_FIELDS_BY_SOURCE.get(source, VOLATILE_FIELDS)
+
+
+def _normalize(value: Any, volatile: AbstractSet[str]) -> Any:
+    if isinstance(value, str):
+        return ' '.join(value.split())
+    if isinstance(value, dict):
+        return {k: _normalize(v, volatile) for k, v in value.items() if k not in volatile}
+    if isinstance(value, (list, tuple)):
+        items = [_normalize(v, volatile) for v in value]
+        if all(isinstance(v, str) for v in items):
+            items.sort()
+        return items
+    return value
+
+
+def fingerprint(row: Dict, volatile: AbstractSet[str] = VOLATILE_FIELDS) -> str:
+    """Stable hash of a record, ignoring ``volatile`` fields; whitespace and field order do not matter."""
+    canonical = json.dumps(_normalize(row, volatile), sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+
+@dataclass
+class Diff:
+    """A batch of records split by what changed since they were last stored."""
+    new: List[Dict] = field(default_factory=list)
+    changed: List[Dict] = field(default_factory=list)
+    unchanged: int = 0
+    hashes: Dict[str, str] = field(default_factory=dict)
+
+    @property
+    def rows(self) -> List[Dict]:
+        """Records that need to be written."""
+        return self.new + self.changed
+
+    def counts(self) -> Counter:
+        return Counter(new=len(self.new), changed=len(self.changed), unchanged=self.unchanged)
+
+
+class FingerprintStore:
+    def __init__(self, name: str = 'fingerprints.db'):
+        self._lock = threading.Lock()
+        self.conn = connect(name)
+        self.conn.execute(
+            'create table if not exists fingerprints ('
+            ' source text not null,'
+            ' id text not null,'
+            ' hash text not null,'
+            ' stored_at real not null,'
+            ' primary key (source, id))'
+        )
+        self.conn.commit()
+
+    def diff(self, source: str, rows: Iterable[Dict]) -> Diff:
+        rows = list(rows)
+        result = Diff()
+        known = self._lookup(source, [str(r['id']) for r in rows])
+        volatile = volatile_fields(source)
+        for row in rows:
+            rid = str(row['id'])
+            digest = fingerprint(row, volatile)
+            result.hashes[rid] = digest
+            if rid not in known:
+                result.new.append(row)
+            elif known[rid] != digest:
+                result.changed.append(row)
+            else:
+                result.unchanged += 1
+        return result
+
+    def commit(self, source: str, diff: Diff, ids: Optional[Iterable[str]] = None) -> None:
+        """Remember the hashes of ``ids`` (default: every record of the diff).
+
+        Call this only for records that were actually written, so a failed
+        write is retried on the next run.
+        """
+        ids = diff.hashes.keys() if ids is None else ids
+        now = time.time()
+        rows = [(source, str(i), diff.hashes[str(i)], now) for i in ids if str(i) in diff.hashes]
+        with self._lock, self.conn:
+            self.conn.executemany(
+                'insert or replace into fingerprints (source, id, hash, stored_at) values (?, ?, ?, ?)',
+                rows,
+            )
+
+    def ids(self, source: str, prefix: str = '') -> List[str]:
+        """Ids with a stored hash, optionally only those starting with ``prefix``."""
+        with self._lock:
+            cur = self.conn.execute(
+                'select id from fingerprints where source = ? and substr(id, 1, ?) = ?',
+                (source, len(prefix), prefix),
+            )
+            return [row[0] for row in cur.fetchall()]
+
+    def forget(self, source: str, ids: Iterable[str]) -> None:
+        with self._lock, self.conn:
+            self.conn.executemany(
+                'delete from fingerprints where source = ? and id = ?',
+                [(source, str(i)) for i in ids],
+            )
+
+    def _lookup(self, source: str, ids: List[str]) -> Dict[str, str]:
+        found = {}
+        with self._lock:
+            # Stay under SQLite's bound-parameter limit.
+            for i in range(0, len(ids), 500):
+                chunk = ids[i:i + 500]
+                marks = ','.join('?' * len(chunk))
+                cur = self.conn.execute(
+                    f'select id, hash from fingerprints where source = ? and id in ({marks})',
+                    [source, *chunk],
+                )
+                found.update(cur.fetchall())
+        return found
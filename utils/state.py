@@ -0,0 +1,54 @@
+"""Local on-disk state kept by the sync job between runs.
+
+Crawl frontiers, HTTP validators and sync cursors live as small SQLite files
+under ``SYNC_STATE_DIR`` so an interrupted or repeated run can pick up where
+the previous one stopped.
+"""
+import os
+import sqlite3
+import threading
+import time
+from typing import Optional
+
+SYNC_STATE_DIR = os.getenv('SYNC_STATE_DIR', '.sync_state')
+
+
+def state_path(name: str) -> str:
+    """Return the path of a state file, creating the state directory if needed."""
+    os.makedirs(SYNC_STATE_DIR, exist_ok=True)
+    return os.path.join(SYNC_STATE_DIR, name)
+
+
+def connect(name: str) -> sqlite3.Connection:
+    """Open (or create) the SQLite state database ``name``."""
+    conn = sqlite3.connect(state_path(name), check_same_thread=False)
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.execute('PRAGMA synchronous=NORMAL')
+    return conn
+
+
+class HighWaterMarks:
+    """Per-source sync cursors, such as the newest update time already ingested."""
+
+    def __init__(self, name: str = 'marks.db'):
+        self._lock = threading.Lock()
+        self.conn = connect(name)
+        self.conn.execute(
+            'create table if not exists marks ('
+            ' source text primary key,'
+            ' value text not null,'
+            ' updated_at real not null)'
+        )
+        self.conn.commit()
+
+    def get(self, source: str) -> Optional[str]:
+        with self._lock:
+            row = self.conn.execute('select value from marks where source = ?', (source,)).fetchone()
+        return row[0] if row else None
+
+    def set(self, source: str, value: str) -> None:
+        with self._lock, self.conn:
+            self.conn.execute(
+                'insert or replace into marks (source, value, updated_at) values (?, ?, ?)',
+                (source, value, time.time()),
+            )
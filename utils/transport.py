@@ -0,0 +1,163 @@
+"""Shared HTTP connection pools for every outbound call.
+
+Fetchers, the GitHub client, the summarizer and the Supabase client all send
+their requests through one ``SharedTransport``, so a connection to a host is
+opened (TCP + TLS) once and then kept alive and reused, over HTTP/2 where the
+server speaks it and ``h2`` is installed.
+
+Synchronous callers get ``httpx.Client`` objects backed by one thread-safe
+pool. Async connection pools belong to the event loop that opened them, and
+the fetchers each run their own short-lived loop, so async requests are run
+on a background loop that owns the shared async pool; ``arequest`` can be
+awaited from any loop.
+
+Per host, the transport counts requests, new connections, TLS handshakes and
+HTTP/2 responses, which shows how often connections were reused.
+"""
+import asyncio
+import importlib.util
+import logging
+import os
+import threading
+from collections import Counter, defaultdict
+from typing import Any, Dict, Optional
+
+import httpx
+
+LOG = logging.getLogger(__name__)
+
+HTTP2_ENABLED = os.getenv('HTTP2_ENABLED', '1') != '0'
+HTTP_MAX_CONNECTIONS = int(os.getenv('HTTP_MAX_CONNECTIONS', '100'))
+# Seconds an idle connection is kept open for reuse.
+HTTP_KEEPALIVE_EXPIRY = float(os.getenv('HTTP_KEEPALIVE_EXPIRY', '60'))
+USER_AGENT = 'flutter-knowledge-sync/1.0 (+https://github.com/BHANU-SOLVINGCLUB/flutter_knowledge_sync)'
+
+
+def http2_available() -> bool:
+    return importlib.util.find_spec('h2') is not None
+
+
+class _ConnectionStats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.hosts: Dict[str, Counter] = defaultdict(Counter)
+
+    def event(self, host: str, name: str) -> None:
+        # httpcore trace events, e.g. "connection.connect_tcp.complete".
+        key = {'connection.connect_tcp.complete': 'connections',
+               'connection.start_tls.complete': 'tls_handshakes'}.get(name)
+        if key:
+            with self._lock:
+                self.hosts[host][key] += 1
+
+    def response(self, host: str, response: httpx.Response) -> None:
+        with self._lock:
+            self.hosts[host]['requests'] += 1
+            if response.extensions.get('http_version') == b'HTTP/2':
+                self.hosts[host]['http2'] += 1
+
+
+class _CountingTransport(httpx.HTTPTransport):
+    """The shared sync pool; clients built on it must not close it."""
+
+    def __init__(self, stats: _ConnectionStats, **kwargs):
+        super().__init__(**kwargs)
+        self._stats = stats
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        host = request.url.host
+        request.extensions = {**request.extensions, 'trace': lambda name, info: self._stats.event(host, name)}
+        response = super().handle_request(request)
+        self._stats.response(host, response)
+        return response
+
+    def close(self) -> None:
+        pass
+
+
+class _AsyncCountingTransport(httpx.AsyncHTTPTransport):
+    def __init__(self, stats: _ConnectionStats, **kwargs):
+        super().__init__(**kwargs)
+        self._stats = stats
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        host = request.url.host
+
+        async def trace(name: str, info: Dict) -> None:
+            self._stats.event(host, name)
+
+        request.extensions = {**request.extensions, 'trace': trace}
+        response = await super().handle_async_request(request)
+        self._stats.response(host, response)
+        return response
+
+
+class SharedTransport:
+    def __init__(self, http2: bool = HTTP2_ENABLED, max_connections: int = HTTP_MAX_CONNECTIONS,
+                 keepalive_expiry: float = HTTP_KEEPALIVE_EXPIRY):
+        if http2 and not http2_available():
+            LOG.info('h2 is not installed; using HTTP/1.1 only')
+            http2 = False
+        self.http2 = http2
+        self._limits = httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections,
+                                    keepalive_expiry=keepalive_expiry)
+        self._stats = _ConnectionStats()
+        self.transport = _CountingTransport(self._stats, http2=http2, limits=self._limits)
+        self._client = self.client()
+        self._lock = threading.Lock()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._async_client: Optional[httpx.AsyncClient] = None
+
+    def client(self, **kwargs: Any) -> httpx.Client:
+        """An ``httpx.Client`` over the shared pool; ``kwargs`` (base_url, headers, ...) go to the client."""
+        headers = {'User-Agent': USER_AGENT, **(kwargs.pop('headers', None) or {})}
+        return httpx.Client(transport=self.transport, headers=headers, **kwargs)
+
+    def request(self, method: str, url: str, **kwargs: Any) -> httpx.Response:
+        return self._client.request(method, url, **kwargs)
+
+    def _async(self) -> asyncio.AbstractEventLoop:
+        with self._lock:
+            if self._loop is None:
+                loop = asyncio.new_event_loop()
+                threading.Thread(target=loop.run_forever, name='http-transport', daemon=True).start()
+                self._async_client = httpx.AsyncClient(
+                    transport=_AsyncCountingTransport(self._stats, http2=self.http2, limits=self._limits),
+                    headers={'User-Agent': USER_AGENT},
+                )
+                self._loop = loop
+            return self._loop
+
+    async def arequest(self, method: str, url: str, **kwargs: Any) -> httpx.Response:
+        """Send a request over the shared async pool; awaitable from any event loop."""
+        loop = self._async()
+        future = asyncio.run_coroutine_threadsafe(self._async_client.request(method, url, **kwargs), loop)
+        return await asyncio.wrap_future(future)
+
+    def stats(self) -> Dict[str, Dict]:
+        """Per host: requests, new connections, TLS handshakes, HTTP/2 responses and reused connections."""
+        with self._stats._lock:
+            hosts = {host: dict(counts) for host, counts in self._stats.hosts.items()}
+        for counts in hosts.values():
+            for key in ('requests', 'connections', 'tls_handshakes', 'http2'):
+                counts.setdefault(key, 0)
+            counts['reused'] = max(0, counts['requests'] - counts['connections'])
+        return hosts
+
+    def log_stats(self) -> None:
+        for host, s in sorted(self.stats().items()):
+            LOG.info('%s: %d requests over %d connections (%d TLS handshakes, %d reused, %d HTTP/2)',
+                     host, s['requests'], s['connections'], s['tls_handshakes'], s['reused'], s['http2'])
+
+
+_transport: Optional[SharedTransport] = None
+_transport_lock = threading.Lock()
+
+
+def get_transport() -> SharedTransport:
+    """The process-wide transport."""
+    global _transport
+    with _transport_lock:
+        if _transport is None:
+            _transport = SharedTransport()
+        return _transport